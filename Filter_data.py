@@ -1,4 +1,5 @@
 from core import *
+from render import table
 import pandas as pd
 from datetime import datetime
 import csv
@@ -8,20 +9,10 @@ class filter(csv_file):  # Filter data by amount
     def filter_by_amount_range(self, min_amount, max_amount):
         # Filter data by amount range
         try:
-            df = pd.read_csv(self.CSV_FILE)  
-            filtered_data = df[(df['Amount'] >= min_amount) & (df['Amount'] <= max_amount)]
+            filtered_data = self.query(min_amount=min_amount, max_amount=max_amount)
             
             if not filtered_data.empty:
-                print("\nFiltered Data by Amount Range:")
-                print("=" * 70)
-                print(f"{'Date':<12} {'Amount':>10} {'Currency':>10} {'Type':>10} {'Use':<30}")
-                print("-" * 70)
-                
-                for _, row in filtered_data.iterrows():
-                    type_str = "Income" if row['Amount'] > 0 else "Expense"
-                    print(f"{row['Date']:<12} {row['Amount']:>10.2f} {row['Currency']:>10} {type_str:>10} {row['Use']:<40}")
-                
-                print("=" * 70)
+                table.browse(filtered_data, "Filtered Data by Amount Range:")
                 return filtered_data
             else:
                 print("No data found in the specified amount range.")
@@ -38,35 +29,22 @@ class filter(csv_file):  # Filter data by amount
             start_date = csv_file.standardize_date(start_date)
             end_date = csv_file.standardize_date(end_date)
             
-            reader = pd.read_csv(self.CSV_FILE) # read the csv file
-            reader["Date"] = pd.to_datetime(reader["Date"], format="%d-%m-%Y")
-
             # Convert the start date to a datetime object
             start_date = datetime.strptime(start_date, "%d-%m-%Y") 
             end_date = datetime.strptime(end_date, "%d-%m-%Y")      
 
-            # Create a boolean mask to filter the data
-            comparator = (reader['Date'] >= start_date) & (reader['Date'] <= end_date)
-            filtered_data = reader.loc[comparator]
+            # The storage backend picks out the rows in the period
+            filtered_data = self.query(start=start_date, end=end_date)
 
             if filtered_data.empty:
                 print("Sorry, no data in this range.")
             else: 
-                print("\nFiltered Data Summary:")
-                print("=" * 70)
-                print(f"{'Date':<12} {'Amount':>10} {'Currency':>10} {'Type':>10} {'Use':<30}")
-                print("-" * 70)
-                
-                #This will iterate through all the rows in the filtered data
-                for _, row in filtered_data.iterrows():
-                    type_str = "Income" if row['Amount'] > 0 else "Expense"
-                    print(f"{row['Date'].strftime('%d-%m-%Y'):<12} {row['Amount']:>10.2f} {row['Currency']:>10} {type_str:>10} {row['Use']:<40}")
+                table.browse(filtered_data, "Filtered Data Summary:")
                 
-                print("=" * 70)
-                
-                total_income = filtered_data[filtered_data["Amount"] > 0]["Amount"].sum()
-                total_expense = abs(filtered_data[filtered_data["Amount"] < 0]["Amount"].sum())
-                net_savings = total_income - total_expense
+                totals = self.totals(start=start_date, end=end_date)
+                total_income = totals['Income']
+                total_expense = totals['Expenses']
+                net_savings = totals['Net']
 
                 print("\nSummary for Selected Period:")
                 print("-" * 50)
@@ -81,13 +59,10 @@ class filter(csv_file):  # Filter data by amount
     @classmethod
     def summary_of_all_data(self):
         try:
-            reader = pd.read_csv(self.CSV_FILE)
-            reader["Date"] = pd.to_datetime(reader["Date"], format="%d-%m-%Y") # convert the date to a datetime object
-
-            
-            total_income = reader[reader["Amount"] > 0]["Amount"].sum()
-            total_expense = abs(reader[reader["Amount"] < 0]["Amount"].sum())
-            net_savings = total_income - total_expense
+            totals = self.totals() # aggregated by the storage backend
+            total_income = totals['Income']
+            total_expense = totals['Expenses']
+            net_savings = totals['Net']
 
             print("\nOverall Financial Summary:")
             print("=" * 60)
@@ -96,8 +71,8 @@ class filter(csv_file):  # Filter data by amount
             print(f"Net Savings:     {net_savings:>10.2f}")
             print("=" * 60)
 
-            income_count = len(reader[reader["Amount"] > 0])
-            expense_count = len(reader[reader["Amount"] < 0])
+            income_count = totals['IncomeCount']
+            expense_count = totals['ExpenseCount']
             print(f"\nTransaction Summary:")
             print("-" * 60)
             print(f"Number of Income Transactions:    {income_count:>5}")
@@ -109,21 +84,16 @@ class filter(csv_file):  # Filter data by amount
             print(f"An error occurred while calculating summary: {error}")
 
     @classmethod
-    def expenses_by_month(self): # organizes all the expenses by month
+    def expenses_by_month(self, by_currency=None): # organizes all the expenses by month
         try:
-            df = pd.read_csv(self.CSV_FILE) 
-            df["Date"] = pd.to_datetime(df["Date"], format="%d-%m-%Y") 
-            
-            # Group by month and calculate income/expenses
-            df['Month'] = df['Date'].dt.strftime('%B %Y')
-            monthly_data = df.groupby('Month').agg({
-                'Amount': lambda x: {
-                    'Income': x[x > 0].sum(),
-                    'Expenses': abs(x[x < 0].sum()),
-                    'Total': x.sum()
-                }
-            }).reset_index()
-            
+            # Amounts in different currencies are not added up, so mixed ledgers get one column group per currency
+            if by_currency is None:
+                by_currency = len(self.rollup('month').index.get_level_values('Currency').unique()) > 1
+            if by_currency:
+                return self.expenses_by_month_and_currency()
+
+            # Monthly income/expenses, grouped by the storage backend
+            monthly_data = self.monthly_totals()
             
             print("\nMonthly Expense Summary:")
             print("=" * 70)
@@ -131,16 +101,15 @@ class filter(csv_file):  # Filter data by amount
             print("-" * 70)
             
             for _, row in monthly_data.iterrows():
-                currency = df[df['Month'] == row['Month']]['Currency'].iloc[0] if not df[df['Month'] == row['Month']].empty else 'PKR'
-                print(f"{row['Month']:<20} {row['Amount']['Income']:>10.2f} {row['Amount']['Expenses']:>10.2f} {row['Amount']['Total']:>10.2f} {currency:>10}")
+                print(f"{row['Month'].strftime('%B %Y'):<20} {row['Income']:>10.2f} {row['Expenses']:>10.2f} {row['Total']:>10.2f} {row['Currency']:>10}")
             
             print("=" * 70)
             
             # Calculate and display overall totals
             print("\nOverall Totals:")
             print("-" * 50)
-            total_income = monthly_data['Amount'].apply(lambda x: x['Income']).sum()
-            total_expenses = monthly_data['Amount'].apply(lambda x: x['Expenses']).sum()
+            total_income = monthly_data['Income'].sum()
+            total_expenses = monthly_data['Expenses'].sum()
             net_savings = total_income - total_expenses
 
             print(f"Total Income:    {total_income:>10.2f}")
@@ -152,34 +121,55 @@ class filter(csv_file):  # Filter data by amount
             print(f"An error occurred while calculating monthly expenses: {error}")
             return None
 
+    @classmethod
+    def expenses_by_month_and_currency(self): # monthly summary with Income/Expenses/Net for each currency side by side
+        try:
+            pivot = self.monthly_by_currency() # one grouped pass over the monthly rollups
+            currencies = list(pivot.columns.get_level_values(0).unique())
+            width = 20 + 33 * len(currencies)
+
+            print("\nMonthly Summary by Currency:")
+            print("=" * width)
+            print(f"{'':<20}" + "".join(f" {currency:^32}" for currency in currencies))
+            print(f"{'Month':<20}" + f" {'Income':>10} {'Expenses':>10} {'Net':>10}" * len(currencies))
+            print("-" * width)
+
+            for month, row in pivot.iterrows():
+                print(f"{month.strftime('%B %Y'):<20}" + "".join(f" {row[(currency, 'Income')]:>10.2f} {row[(currency, 'Expenses')]:>10.2f} {row[(currency, 'Net')]:>10.2f}" for currency in currencies))
+
+            print("=" * width)
+
+            # Overall totals, still kept apart per currency
+            totals = pivot.sum()
+            print("\nOverall Totals:")
+            print("-" * 50)
+            print(f"{'Currency':<10} {'Income':>12} {'Expenses':>12} {'Net':>12}")
+            for currency in currencies:
+                print(f"{currency:<10} {totals[(currency, 'Income')]:>12.2f} {totals[(currency, 'Expenses')]:>12.2f} {totals[(currency, 'Net')]:>12.2f}")
+            print("=" * 50)
+            return pivot
+
+        except Exception as error:
+            print(f"An error occurred while calculating monthly expenses by currency: {error}")
+            return None
+
     @classmethod
     def filter_by_type(self, type_str): # This is the most difficult one to write.
         # Filter data by type (income/expense)
         try:
-            df = pd.read_csv(self.CSV_FILE)
-            if type_str.lower() == "income":
-                filtered_data = df[df['Amount'] > 0]
-            elif type_str.lower() == "expense":
-                filtered_data = df[df['Amount'] < 0]
+            if type_str.lower() in ["income", "expense"]:
+                filtered_data = self.query(kind=type_str.lower())
             else:
                 print("Invalid type. Please use 'income' or 'expense'.")
                 return None
             
             if not filtered_data.empty:
-                print(f"\nFiltered Data for {type_str.title()}:")
-                print("=" * 70)
-                print(f"{'Date':<12} {'Amount':>10} {'Currency':>10} {'Type':>10} {'Use':<30}")
-                print("-" * 70)
-                
-                for _, row in filtered_data.iterrows():
-                    type_str = "Income" if row['Amount'] > 0 else "Expense"
-                    print(f"{row['Date']:<12} {row['Amount']:>10.2f} {row['Currency']:>10} {type_str:>10} {row['Use']:<40}")
-                
-                print("=" * 70)
+                table.browse(filtered_data, f"Filtered Data for {type_str.title()}:")
                 
                 # Calculate summary for the type
-                total_amount = abs(filtered_data['Amount'].sum())
-                transaction_count = len(filtered_data)
+                totals = self.totals(kind=type_str.lower())
+                total_amount = totals['Income'] if type_str.lower() == "income" else totals['Expenses']
+                transaction_count = totals['IncomeCount'] if type_str.lower() == "income" else totals['ExpenseCount']
                 
                 print("\nSummary:")
                 print("-" * 50)
@@ -196,6 +186,17 @@ class filter(csv_file):  # Filter data by amount
             print(f"Error filtering by type: {e}")
             return None
 
+    @classmethod
+    def top_expenses(self, count=10): # biggest expenses, read off the amount index instead of sorting everything
+        try:
+            top = self.largest_expenses(count)
+            if top.empty:
+                print("No expense transactions found.")
+                return None
 
+            table.browse(top, f"Top {len(top)} Largest Expenses:")
+            return top
 
-
+        except Exception as e:
+            print(f"Error finding largest expenses: {e}")
+            return None
@@ -0,0 +1,59 @@
+# Daily income, expenses and net: the dict-returning lambda groupby the app used to run against aggregation.sums.
+# Usage: python benchmarks/aggregate.py [--rows 1000000] [--min-speedup 5]
+import argparse
+import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import numpy as np
+import pandas as pd
+from aggregation import aggregation
+from ledger import synthetic
+
+def lambdas(df): # the old per-group python, unpacked again with apply
+    daily = df.groupby('Date').agg({
+        'Amount': lambda x: {
+            'Income': x[x > 0].sum(),
+            'Expenses': abs(x[x < 0].sum()),
+            'Net': x.sum()
+        }
+    })
+    return pd.DataFrame({name: daily['Amount'].apply(lambda x: x[name]) for name in ['Income', 'Expenses', 'Net']})
+
+def vectorized(df):
+    return aggregation.sums(df['Amount'], [df['Date']])[['Income', 'Expenses', 'Net']]
+
+def best(function, df, repeat): # fastest of a few runs, the others are noise
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(df)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--min-speedup", type=float, default=5.0, help="fail when aggregation.sums is not this much faster")
+    args = parser.parse_args()
+
+    df = synthetic(args.rows)
+    df['Date'] = pd.to_datetime(df['Date'], format='%d-%m-%Y')
+    df['Amount'] = (df['Amount'] * 100).round().astype('int64') # minor units, like the typed ledger
+
+    old_time, old = best(lambdas, df, args.repeat)
+    new_time, new = best(vectorized, df, args.repeat)
+    if not np.array_equal(old.values.astype('int64'), new.values) or not old.index.equals(new.index.get_level_values('Date')):
+        print("results differ")
+        return 1
+
+    speedup = old_time / new_time
+    print(f"rows: {args.rows}")
+    print(f"lambda groupby + apply: {old_time:8.3f}s")
+    print(f"aggregation.sums:       {new_time:8.3f}s")
+    print(f"speedup:                {speedup:8.1f}x (budget {args.min_speedup}x)")
+    return 0 if speedup >= args.min_speedup else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,14 @@
+# Synthetic ledger shared by the benchmarks
+import numpy as np
+import pandas as pd
+
+def synthetic(rows, seed=0): # ten years of days, 3 currencies, 300 uses, repeated comments
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp('2015-01-01') + pd.to_timedelta(rng.integers(0, 3650, rows), unit='D')
+    return pd.DataFrame({
+        'Date': dates.strftime('%d-%m-%Y'),
+        'Amount': np.round(rng.normal(0, 500, rows), 2),
+        'Currency': rng.choice(['PKR', 'USD', 'EUR'], rows),
+        'Use': np.char.add('use ', rng.integers(0, 300, rows).astype(str)),
+        'Comment': np.char.add('note ', rng.integers(0, 1000, rows).astype(str))
+    })
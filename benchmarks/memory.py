@@ -0,0 +1,33 @@
+# Memory of the ledger as plain pandas columns (object strings, float amounts) against csv_file's typed schema.
+# Usage: python benchmarks/memory.py [--rows 10000000] [--min-ratio 4]
+# Works on a synthetic ledger in a temporary folder, data.csv in the project is never touched.
+import argparse
+import os
+import sys
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pandas as pd
+from core import csv_file
+from ledger import synthetic
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--min-ratio", type=float, default=4.0, help="fail when the typed ledger is not this much smaller")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        os.chdir(folder)
+        synthetic(args.rows).to_csv(csv_file.CSV_FILE, index=False)
+        plain = pd.read_csv(csv_file.CSV_FILE).memory_usage(deep=True).sum()
+        typed = csv_file.load(copy=False).memory_usage(deep=True).sum()
+
+    ratio = plain / typed
+    print(f"rows: {args.rows}")
+    print(f"plain columns: {plain / 2**20:10.1f} MB")
+    print(f"typed schema:  {typed / 2**20:10.1f} MB")
+    print(f"reduction:     {ratio:10.1f}x (budget {args.min_ratio}x)")
+    return 0 if ratio >= args.min_ratio else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+# Start-up cost of the command line: import time of `main.py --help` and wall time of --help and a one-off add.
+# Usage: python benchmarks/startup.py [--rows 1000000] [--repeat 5] [--budget-ms 300]
+# Runs against a large synthetic ledger whose rollups sidecar is already built, the way a ledger looks after
+# a report, in a temporary folder; data.csv in the project is never touched.
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from ledger import synthetic
+
+MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main.py')
+HEAVY = ['pandas', 'numpy', 'matplotlib', 'sklearn', 'scipy'] # none of these may load before a command needs them
+ADD = ['add', '--amount', '150', '--type', 'expense', '--use', 'Groceries', '--currency', 'PKR']
+
+def import_times(folder, *arguments):
+    # (cumulative microseconds of every top-level import, top-level module names) from python -X importtime
+    result = subprocess.run([sys.executable, '-X', 'importtime', MAIN, *arguments], cwd=folder, capture_output=True, text=True, check=True)
+    total, modules = 0, set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not cumulative.strip().isdigit(): # the header
+            continue
+        modules.add(name.strip().split('.')[0])
+        if not name.startswith('  '): # top level, its cumulative time already holds everything below it
+            total += int(cumulative)
+    return total, modules
+
+def wall_time(folder, arguments, repeat): # best of a few runs, the others are noise
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, MAIN, *arguments], cwd=folder, capture_output=True, check=True)
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=300.0, help="fail when a command takes longer than this")
+    args = parser.parse_args()
+
+    failed = False
+    with tempfile.TemporaryDirectory() as folder:
+        synthetic(args.rows).to_csv(os.path.join(folder, 'data.csv'), index=False)
+        subprocess.run([sys.executable, MAIN, 'summary'], cwd=folder, capture_output=True, check=True) # builds the sidecars
+        rollups = os.path.join(folder, 'data.csv.rollups')
+        written = os.stat(rollups).st_mtime_ns
+        for label, arguments in (('--help', ['--help']), ('add', ADD)):
+            imports, modules = import_times(folder, *arguments)
+            heavy = sorted(set(HEAVY) & modules)
+            took = wall_time(folder, arguments, args.repeat)
+            print(f"{args.rows} rows, main.py {label:7} imports {imports / 1000:7.1f} ms, wall {took:7.1f} ms (budget {args.budget_ms:.0f} ms)"
+                  + (f", loads {', '.join(heavy)}" if heavy else ""))
+            failed = failed or took > args.budget_ms or bool(heavy)
+        if os.stat(rollups).st_mtime_ns != written: # adds go to the small rollup log, the sidecar is left alone
+            print("main.py add rewrote data.csv.rollups")
+            failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
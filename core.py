@@ -1,23 +1,215 @@
-import pandas as pd
 from datetime import datetime
+import atexit
 import csv
+import json
+import os
+import threading
+from lazy import lazy_module
+from aggregation import aggregation
+
+pd = lazy_module('pandas') # imported on first use, so adding a row from a script never pays for pandas
+np = lazy_module('numpy')
+
+class sorted_index: # Row ids kept in the order of one column, so range lookups are a binary search.
+    def __init__(self, values, ids):
+        order = np.argsort(values, kind='stable')
+        self.keys = values[order]
+        self.ids = ids[order]
+
+    def range(self, low=None, high=None):
+        # ids of rows with low <= value <= high, in value order
+        start = 0 if low is None else np.searchsorted(self.keys, low, side='left')
+        stop = len(self.keys) if high is None else np.searchsorted(self.keys, high, side='right')
+        return self.ids[start:stop]
+
+    def insert(self, values, ids):
+        order = np.argsort(values, kind='stable')
+        values, ids = values[order], ids[order]
+        positions = np.searchsorted(self.keys, values, side='right')
+        self.keys = np.insert(self.keys, positions, values)
+        self.ids = np.insert(self.ids, positions, ids)
+
+    def remove(self, value, row_id):
+        start = np.searchsorted(self.keys, value, side='left')
+        stop = np.searchsorted(self.keys, value, side='right')
+        positions = start + np.flatnonzero(self.ids[start:stop] == row_id)
+        self.keys = np.delete(self.keys, positions)
+        self.ids = np.delete(self.ids, positions)
+
+
+class rollup_store: # One rollup level kept columnar: sorted (date, currency, use) keys and an int64 value matrix.
+    # Currencies and uses are codes into sorted label arrays, so a whole key compares as one int64 and a delta
+    # is merged with a binary search instead of a Python loop over buckets.
+    def __init__(self, dates, currencies, uses, currency_labels, use_labels, values):
+        self.dates = dates # datetime64[D]
+        self.currencies = currencies # int32 codes into currency_labels
+        self.uses = uses # int32 codes into use_labels
+        self.currency_labels = currency_labels # sorted, unique str arrays
+        self.use_labels = use_labels
+        self.values = values # one row per key, aggregation.COLUMNS in minor units and counts
+
+    @classmethod
+    def labelled(cls, dates, currencies, currency_labels, uses, use_labels, values, drop_empty=True):
+        # Rows in any order, keys may repeat, labels in any order and of any type: summed per key and sorted.
+        # drop_empty=False keeps buckets whose counts cancel out, as a delta that edits a row in place has.
+        codes = []
+        for labels, positions in ((currency_labels, currencies), (use_labels, uses)):
+            labels, remap = np.unique(np.asarray(labels).astype(str), return_inverse=True)
+            codes.append((labels, remap.reshape(-1).astype('int32')[np.asarray(positions, dtype='int64')]))
+        (currency_labels, currencies), (use_labels, uses) = codes
+        store = cls(np.asarray(dates, dtype='datetime64[D]'), currencies, uses, currency_labels, use_labels,
+                    np.array(values, dtype='int64').reshape(-1, len(aggregation.COLUMNS))) # own, writable copy
+        return store.collapse(drop_empty)
+
+    @classmethod
+    def from_parts(cls, parts, drop_empty=True):
+        # From rollup_parts(): a frame indexed by (Date, Currency, Use), possibly concatenated from several
+        index = parts.index
+        dates = index.levels[0].values.astype('datetime64[D]')[index.codes[0]]
+        return cls.labelled(dates, index.codes[1], index.levels[1], index.codes[2], index.levels[2], parts.values, drop_empty)
+
+    @classmethod
+    def from_rows(cls, rows, drop_empty=True):
+        # From [date 'YYYY-MM-DD', currency, use, *values] lists, the form the rollup log keeps
+        if not rows:
+            return cls.labelled([], [], [], [], [], np.zeros((0, len(aggregation.COLUMNS))), drop_empty)
+        dates, currencies, uses = (np.array([row[position] for row in rows]) for position in range(3))
+        currency_labels, currency_codes = np.unique(currencies, return_inverse=True)
+        use_labels, use_codes = np.unique(uses, return_inverse=True)
+        return cls.labelled(dates.astype('datetime64[D]'), currency_codes.reshape(-1), currency_labels,
+                            use_codes.reshape(-1), use_labels, [row[3:] for row in rows], drop_empty)
+
+    @classmethod
+    def from_arrays(cls, saved, prefix):
+        return cls(saved[prefix + 'dates'], saved[prefix + 'currencies'], saved[prefix + 'uses'],
+                   saved[prefix + 'currency_labels'], saved[prefix + 'use_labels'], saved[prefix + 'values'])
+
+    def arrays(self, prefix):
+        # What np.savez writes for this level, plain arrays only
+        return {prefix + 'dates': self.dates, prefix + 'currencies': self.currencies, prefix + 'uses': self.uses,
+                prefix + 'currency_labels': self.currency_labels, prefix + 'use_labels': self.use_labels,
+                prefix + 'values': self.values}
+
+    def rows(self):
+        return [[date, currency, use] + values for date, currency, use, values in zip(
+            self.dates.astype(str).tolist(), self.currency_labels[self.currencies].tolist(),
+            self.use_labels[self.uses].tolist(), self.values.tolist())]
+
+    def keys(self):
+        # (date, currency, use) as one int64 that sorts like the tuple, only comparable under the same labels
+        days = self.dates.astype('int64')
+        return (days * max(len(self.currency_labels), 1) + self.currencies) * max(len(self.use_labels), 1) + self.uses
+
+    def collapse(self, drop_empty=True):
+        # Sort by key and sum repeated keys
+        keys = self.keys()
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1]))) if len(keys) else np.zeros(0, dtype='int64')
+        if len(keys):
+            self.values = np.add.reduceat(self.values[order], starts, axis=0)
+        first = order[starts]
+        self.dates, self.currencies, self.uses = self.dates[first], self.currencies[first], self.uses[first]
+        return self.drop_empty() if drop_empty else self
+
+    def drop_empty(self):
+        # A bucket with no transactions left in it is gone, as if it had never been added
+        keep = (self.values[:, 3] != 0) | (self.values[:, 4] != 0) # IncomeCount, ExpenseCount
+        if not keep.all():
+            self.dates, self.currencies, self.uses, self.values = self.dates[keep], self.currencies[keep], self.uses[keep], self.values[keep]
+        return self
+
+    def relabel(self, currency_labels, use_labels):
+        # Same keys under wider (still sorted) label arrays, which keeps their order
+        self.currencies = np.searchsorted(currency_labels, self.currency_labels).astype('int32')[self.currencies]
+        self.uses = np.searchsorted(use_labels, self.use_labels).astype('int32')[self.uses]
+        self.currency_labels, self.use_labels = currency_labels, use_labels
+
+    def merge(self, delta):
+        # Add a collapsed delta (negative values take rows away), touching only the keys it holds
+        if not len(delta.values):
+            return self
+        currency_labels = np.union1d(self.currency_labels, delta.currency_labels)
+        use_labels = np.union1d(self.use_labels, delta.use_labels)
+        delta = rollup_store(delta.dates, delta.currencies, delta.uses, delta.currency_labels, delta.use_labels, delta.values)
+        for store in (self, delta):
+            store.relabel(currency_labels, use_labels)
+        keys, other = self.keys(), delta.keys()
+        positions = np.searchsorted(keys, other)
+        found = positions < len(keys)
+        found[found] = keys[positions[found]] == other[found]
+        self.values[positions[found]] += delta.values[found]
+        new = ~found
+        if new.any():
+            at = positions[new]
+            self.dates = np.insert(self.dates, at, delta.dates[new])
+            self.currencies = np.insert(self.currencies, at, delta.currencies[new])
+            self.uses = np.insert(self.uses, at, delta.uses[new])
+            self.values = np.insert(self.values, at, delta.values[new], axis=0)
+        return self.drop_empty()
+
+    def months(self):
+        # The same buckets summed per first day of their month
+        months = self.dates.astype('datetime64[M]').astype('datetime64[D]')
+        return rollup_store(months, self.currencies, self.uses, self.currency_labels, self.use_labels, self.values.copy()).collapse(False)
+
+    def frame(self, columns):
+        # As a frame indexed by (Date, Currency, Use), built straight from the codes without hashing a key
+        starts = np.concatenate(([True], self.dates[1:] != self.dates[:-1])) if len(self.dates) else np.zeros(0, dtype=bool)
+        index = pd.MultiIndex(
+            levels=[pd.DatetimeIndex(self.dates[starts].astype('datetime64[ns]')), pd.Index(self.currency_labels, dtype=object), pd.Index(self.use_labels, dtype=object)],
+            codes=[np.cumsum(starts) - 1, self.currencies, self.uses], names=['Date', 'Currency', 'Use'], verify_integrity=False)
+        return pd.DataFrame(self.values, index=index.remove_unused_levels(), columns=columns, copy=True)
+
 
 class csv_file: # A class to handle CSV file operations.
     CSV_FILE = 'data.csv' # csv file is data.csv called through CSV_FILE
+    BACKEND = os.environ.get('FINANCES_BACKEND', 'csv') # 'csv' for data.csv, 'sqlite' for the indexed data.db
+    BASE_CURRENCY = os.environ.get('FINANCES_BASE_CURRENCY') or None # report everything in this currency, None keeps currencies apart
     Columns = ['Date', 'Amount', 'Currency', 'Use', 'Comment'] # To put categories in csv file
+    MINOR_UNITS = 100 # amounts are held in memory as integer cents/paisa so totals never drift
+    CATEGORIES = ['Currency', 'Use', 'Comment'] # text columns kept as categoricals, repeated values are stored once
+    DATE_FORMATS = [
+        "%d-%m-%Y", "%d/%m/%Y", "%Y-%m-%d", "%Y/%m/%d",
+        "%d-%m-%y", "%d/%m/%y", "%y-%m-%d", "%y/%m/%d",
+        "%d.%m.%Y", "%d.%m.%y", "%Y.%m.%d", "%y.%m.%d"
+    ] # supported input formats, tried in this order
+    _date_memo = {} # raw date string -> standardized date, ledgers repeat the same dates a lot
+    SAMPLE_ROW = {
+        'Date': '01-01-2025',
+        'Amount': 1,
+        'Currency': 'PKR',
+        'Use': 'Error Handling',
+        'Comment':'This will be added if file is not present to avoid errors. This sample entry will be automatically deleted upon your first entry.'
+    } # placeholder written to a fresh data.csv
+    PATCH_LIMIT = 256 * 1024 # bytes of patch log before it is merged back into data.csv
+    CHUNK_ROWS = 1000000 # rows read at a time when streaming
+    STREAM_THRESHOLD = 512 * 1024 * 1024 # data.csv larger than this is summarized in chunks instead of loaded
+    ROLLUP_LOG_LIMIT = 1024 * 1024 # bytes of rollup log before the whole rollups sidecar is written again
+    ROLLUP_COLUMNS = aggregation.COLUMNS
+    _rollups = None # {'day': rollup_store, 'month': rollup_store}, running sums in minor units per (date, currency, use)
+    _rollups_key = None # ledger signature the rollups describe
+    _rollups_dirty = False # to be written whole next to data.csv at exit, smaller changes go to its log instead
+    _rollups_version = 0 # bumped on every change to the in-memory rollups, so derived state can tell it is current
+    _rollup_hooks = [] # hook(signed day_parts, version) told about every delta, e.g. the forecast model's statistics
+    _rollup_frames = {} # (level, version) -> rollup as a frame, read-only, shared by every report on that version
+    _series = None # dense daily series shared by trends, predictions and rolling figures
+    _series_key = None # (data version, base currency, rates) it was built for
+    _cache = None # parsed ledger shared by every subclass
+    _cache_key = None # file signature the cached ledger was read from
+    _cache_rows = 0 # rows physically in data.csv, new rows get ids after these
+    _cache_tail = [] # rows appended since the cache was read, folded in on the next load
+    _indexes = {} # column -> sorted_index over the cached ledger, kept up to date as it changes
+    _indexes_dirty = set() # indexes changed since they were last written next to data.csv
+    _ids = None # (ids, next id) from data.csv.ids, None while row ids are still plain positions
+    _ids_key = None # file signature of data.csv.ids it was read from
+    _lock = threading.RLock() # compaction runs in the background, everything touching the files takes this
     
     @classmethod
     def standardize_date(self, date_str):
         try:
-            # Try different common date formats
-            formats = [
-                "%d-%m-%Y", "%d/%m/%Y", "%Y-%m-%d", "%Y/%m/%d",
-                "%d-%m-%y", "%d/%m/%y", "%y-%m-%d", "%y/%m/%d",
-                "%d.%m.%Y", "%d.%m.%y", "%Y.%m.%d", "%y.%m.%d"
-            ]
-            
-            # Try each format
-            for fmt in formats:
+            # Try each common date format
+            for fmt in self.DATE_FORMATS:
                 try:
                     date_obj = datetime.strptime(date_str, fmt)
                     return date_obj.strftime("%d-%m-%Y")
@@ -29,61 +221,868 @@ class csv_file: # A class to handle CSV file operations.
             raise ValueError(f"Date standardization error: {str(e)}")
 
     @classmethod
-    def get_csv(self):
-        # Initialize the CSV file with headers if it does not exist.
+    def standardize_dates(self, dates):
+        # Column version of standardize_date, gives the same result for every value.
+        dates = pd.Series(dates, dtype=object)
+        if len(csv_file._date_memo) > 100000: # keep the memo from growing without bound
+            csv_file._date_memo.clear()
+        memo = csv_file._date_memo
+
+        # Only distinct raw strings that have not been seen before need parsing
+        pending = pd.Series([value for value in pd.unique(dates) if value not in memo], dtype=object)
+        pending = pending[pending.map(type) == str]
+        for fmt in self.DATE_FORMATS:
+            if pending.empty:
+                break
+            separator = fmt[2]
+            if not pending.str.contains(separator, regex=False).any():
+                continue # no value in this batch can use this format
+
+            parsed = pd.to_datetime(pending, format=fmt, errors='coerce')
+            matched = parsed.notna()
+            memo.update(zip(pending[matched], parsed[matched].dt.strftime("%d-%m-%Y")))
+            pending = pending[~matched]
+
+        # Whatever is left (values pandas can not parse, non strings) goes through the scalar path,
+        # which also raises the same error for dates that are really invalid
+        for value in pd.unique(dates):
+            if value not in memo:
+                memo[value] = self.standardize_date(value)
+
+        return dates.map(memo)
+
+    @classmethod
+    def storage(self):
+        # Backend that reads and writes go to when the ledger is not kept in data.csv
+        if self.BACKEND == 'sqlite':
+            from storage import sqlite_storage
+            return sqlite_storage
+        return None
+
+    @classmethod
+    def get_csv(self, load=True):
+        # Initialize the CSV file with headers if it does not exist. load=False skips reading the ledger.
+        if self.storage():
+            self.storage().connect()
+            return None
         try:
-            df = pd.read_csv(self.CSV_FILE)
-            # Standardize dates in existing data
-            if not df.empty:
-                df['Date'] = df['Date'].apply(self.standardize_date)
-                df.to_csv(self.CSV_FILE, index=False)
-            return df
+            # Nothing to do if the file has not changed since it was last standardized
+            if self.read_meta().get('canonical') == list(self.file_signature()):
+                return self.load(copy=False) if load else None
+
+            with csv_file._lock:
+                # Standardize dates in existing data chunk by chunk into a copy beside it, so memory does not grow
+                # with the ledger, and only swap the copy in if a date actually changed. Other columns are read and
+                # written back as text, exactly as they were.
+                temp_file = self.CSV_FILE + '.dates.tmp'
+                changed = False
+                chunks = pd.read_csv(self.CSV_FILE, chunksize=self.CHUNK_ROWS, dtype=str, keep_default_na=False)
+                with open(temp_file, 'w', newline='') as out:
+                    for number, chunk in enumerate(chunks):
+                        standardized = self.standardize_dates(chunk['Date'])
+                        changed = changed or bool((standardized.values != chunk['Date'].values).any())
+                        chunk['Date'] = standardized.values
+                        chunk.to_csv(out, index=False, header=number == 0)
+                    out.flush()
+                    os.fsync(out.fileno())
+                if changed:
+                    os.replace(temp_file, self.CSV_FILE)
+                else:
+                    os.remove(temp_file)
+                self.mark_canonical()
+            return self.load(copy=False) if load else None
         except FileNotFoundError:
-            file = pd.DataFrame(columns=self.Columns)
-            file.to_csv(self.CSV_FILE, index=False)
-            
-            with open(self.CSV_FILE, 'a', newline='') as csvfile: # opening csv file in append mode.
+            with open(self.CSV_FILE, 'w', newline='') as csvfile: # header and the placeholder row
                 writer = csv.DictWriter(csvfile, fieldnames=self.Columns)
-                sample_dict = {
-                'Date': '01-01-2025',
-                'Amount': 1,
-                'Currency': 'PKR',
-                'Use': 'Error Handling',
-                'Comment':'This will be added if file is not present to avoid errors. This sample entry will be automatically deleted upon your first entry.'
-                }
-                writer.writerow(sample_dict)
-                return file
+                writer.writeheader()
+                writer.writerow(self.SAMPLE_ROW)
+            self.write_meta(sentinel=True, sentinel_of=list(self.file_signature()))
+            self.mark_canonical()
+            return pd.DataFrame(columns=self.Columns) if load else None
+
+    @classmethod
+    def meta_file(self):
+        # sidecar next to data.csv that remembers facts about the ledger between runs
+        return self.CSV_FILE + '.meta'
+
+    @classmethod
+    def read_meta(self):
+        try:
+            with open(self.meta_file()) as meta:
+                return json.load(meta)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    @classmethod
+    def write_meta(self, **updates):
+        meta = self.read_meta()
+        meta.update(updates)
+        temp_file = self.meta_file() + '.tmp'
+        with open(temp_file, 'w') as out:
+            json.dump(meta, out)
+        os.replace(temp_file, self.meta_file()) # atomic, so a crash never leaves half a sidecar
+
+    @classmethod
+    def mark_canonical(self):
+        # Record that data.csv, as it is right now, only holds standardized dates.
+        self.write_meta(canonical=list(self.file_signature()))
+
+    @classmethod
+    def file_signature(self, path=None):
+        # mtime, size and inode change whenever a file is rewritten or appended to
+        stat = os.stat(path or self.CSV_FILE)
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    @classmethod
+    def patch_file(self):
+        # append-only log of deletes and edits, keyed by row id (see row_ids)
+        return self.CSV_FILE + '.patches'
+
+    @classmethod
+    def id_file(self):
+        # ids of the rows compact() wrote to data.csv and the next id to hand out, so ids survive compaction
+        return self.CSV_FILE + '.ids'
+
+    @classmethod
+    def row_ids(self, start, count):
+        # Stable ids of the physical rows start..start+count-1 of data.csv. Until the first compaction a row's id
+        # is its position; after one, the compacted rows keep their old ids and appended rows continue from next.
+        try:
+            key = self.file_signature(self.id_file())
+        except FileNotFoundError:
+            key = None
+        if key != csv_file._ids_key:
+            csv_file._ids = None
+            if key is not None:
+                with np.load(self.id_file(), allow_pickle=False) as saved:
+                    csv_file._ids = (saved['ids'], int(saved['next']))
+            csv_file._ids_key = key
+        positions = np.arange(start, start + count, dtype='int64')
+        if csv_file._ids is None:
+            return positions
+        ids, next_id = csv_file._ids
+        return np.concatenate([ids[positions[positions < len(ids)]], next_id + positions[positions >= len(ids)] - len(ids)])
+
+    @classmethod
+    def finish_compaction(self):
+        # Complete a compaction that got as far as retiring its patch log (the commit point) but not further,
+        # e.g. because the process died. Before that point data.csv and its log are untouched and still agree.
+        merged = self.patch_file() + '.merged'
+        if not os.path.exists(merged):
+            return
+        with csv_file._lock:
+            if not os.path.exists(merged):
+                return # another thread just finished it
+            for temp_file, target in ((self.id_file() + '.tmp', self.id_file()), (self.CSV_FILE + '.tmp', self.CSV_FILE)):
+                if os.path.exists(temp_file):
+                    os.replace(temp_file, target)
+            os.remove(merged)
+
+    @classmethod
+    def ledger_signature(self):
+        # The ledger is data.csv plus whatever is in its patch log
+        self.finish_compaction() # every reader starts here, so none sees half a compaction
+        try:
+            patches = self.file_signature(self.patch_file())
+        except FileNotFoundError:
+            patches = None
+        return (self.file_signature(), patches)
+
+    @classmethod
+    def read_patches(self):
+        # Collapse the patch log into the rows it deletes and the latest values for edited rows
+        deleted, edits = set(), {}
+        try:
+            with open(self.patch_file()) as log:
+                for line in log:
+                    if not line.strip():
+                        continue # a write cut short by a crash
+                    entry = json.loads(line)
+                    if entry['op'] == 'delete':
+                        deleted.add(entry['row'])
+                        edits.pop(entry['row'], None)
+                    else:
+                        edits.setdefault(entry['row'], {}).update(entry['values'])
+        except FileNotFoundError:
+            pass
+        return deleted, edits
+
+    @classmethod
+    def minor(self, amount):
+        # major units (what the user types) -> integer minor units
+        return int(round(float(amount) * self.MINOR_UNITS))
+
+    @classmethod
+    def amount(self, value):
+        # A typed-in amount as a float, refused when it is missing or finer than the minor unit:
+        # anything smaller would be rounded away in memory and then written back rounded by compact()
+        try:
+            amount = float(value)
+        except (TypeError, ValueError):
+            amount = float('nan')
+        if amount != amount:
+            raise ValueError(f"Amount is missing or not a number: {value!r}")
+        scaled = amount * self.MINOR_UNITS
+        if abs(scaled - round(scaled)) > 1e-6 + 1e-12 * abs(scaled): # float noise such as 12.34 * 100 = 1233.9999999999998 is fine
+            raise ValueError(f"Amount {value!r} is finer than 1/{self.MINOR_UNITS}, the smallest unit the ledger keeps")
+        return amount
+
+    @classmethod
+    def major(self, amounts):
+        # integer minor units -> major units for display and for the totals we hand out
+        return amounts / self.MINOR_UNITS
+
+    @classmethod
+    def typed(self, df, date_format="%d-%m-%Y"):
+        # Canonical in-memory schema: datetime64 Date, int64 minor-unit Amount, categorical text columns.
+        # Works on frames holding only some of the columns, as streaming reads.
+        if 'Date' in df and not pd.api.types.is_datetime64_any_dtype(df['Date']):
+            df['Date'] = pd.to_datetime(df['Date'], format=date_format)
+        if 'Amount' in df:
+            amounts = pd.to_numeric(df['Amount'], errors='coerce').astype(float)
+            missing = amounts.isna().values
+            if missing.any(): # never guessed as zero, that would quietly change every total
+                rows = ", ".join(str(row) for row in df.index[missing][:5])
+                raise ValueError(f"Amount is missing or not a number in {int(missing.sum())} row(s) of the ledger (row ids {rows}{', ...' if missing.sum() > 5 else ''})")
+            scaled = amounts.values * self.MINOR_UNITS
+            rounded = np.round(scaled)
+            finer = ~np.isclose(scaled, rounded, rtol=1e-12, atol=1e-6)
+            if finer.any(): # rounding them would change the totals, and compact() would write the rounded value back
+                rows = ", ".join(str(row) for row in df.index[finer][:5])
+                raise ValueError(f"Amount is finer than 1/{self.MINOR_UNITS} in {int(finer.sum())} row(s) of the ledger (row ids {rows}{', ...' if finer.sum() > 5 else ''})")
+            df['Amount'] = rounded.astype('int64')
+        for column in self.CATEGORIES:
+            if column in df:
+                df[column] = df[column].astype('category')
+        return df
+
+    @classmethod
+    def concat_typed(self, first, second):
+        # pd.concat falls back to object columns unless both sides share the same categories
+        for column in self.CATEGORIES:
+            if column in first and column in second:
+                categories = first[column].cat.categories.union(second[column].cat.categories)
+                first[column] = first[column].cat.set_categories(categories)
+                second[column] = second[column].cat.set_categories(categories)
+        return pd.concat([first, second])
+
+    @classmethod
+    def apply_patches(self, df, deleted, edits):
+        # Works on any typed slice of the ledger as long as its index holds the row ids
+        df = df.drop(index=df.index.intersection(list(deleted)))
+        for row, values in edits.items():
+            if row not in df.index:
+                continue
+            for column, value in values.items():
+                if column not in df.columns:
+                    continue # streaming only reads the columns it aggregates
+                if column == 'Date':
+                    value = pd.to_datetime(value, format="%d-%m-%Y")
+                elif column == 'Amount':
+                    value = self.minor(value)
+                elif column in self.CATEGORIES and value not in df[column].cat.categories:
+                    df[column] = df[column].cat.add_categories([value])
+                df.at[row, column] = value
+        return df
+
+    @classmethod
+    def load(self, copy=True):
+        # Return the parsed ledger, only re-reading data.csv when it changed on disk.
+        if self.storage():
+            return self.storage().load()
+        with csv_file._lock:
+            try:
+                key = self.ledger_signature()
+            except FileNotFoundError:
+                self.get_csv()
+                key = self.ledger_signature()
+
+            if csv_file._cache is None or csv_file._cache_key != key:
+                df = self.typed(pd.read_csv(self.CSV_FILE))
+                df.index = self.row_ids(0, len(df))
+                csv_file._cache_rows = len(df)
+                csv_file._cache = self.apply_patches(df, *self.read_patches())
+                csv_file._cache_key = key
+                csv_file._cache_tail = []
+                csv_file._indexes = {}
+                csv_file._indexes_dirty = set()
+            elif csv_file._cache_tail:
+                tail = self.typed(pd.DataFrame(csv_file._cache_tail, columns=self.Columns))
+                tail.index = self.row_ids(csv_file._cache_rows, len(tail))
+                csv_file._cache = self.concat_typed(csv_file._cache, tail)
+                for column, index in csv_file._indexes.items():
+                    index.insert(tail[column].values, tail.index.values)
+                    csv_file._indexes_dirty.add(column)
+                csv_file._cache_rows += len(tail)
+                csv_file._cache_tail = []
+
+            # callers add columns and set indexes, so they get their own copy unless they only read
+            return csv_file._cache.copy() if copy else csv_file._cache
+
+    @classmethod
+    def index_file(self, column):
+        return f"{self.CSV_FILE}.{column.lower()}.npz"
+
+    @classmethod
+    def column_index(self, column):
+        # Sorted index over one column of the cached ledger, read from its sidecar or built on first use
+        df = self.load(copy=False)
+        if column not in csv_file._indexes:
+            signature = json.dumps(self.ledger_signature())
+            try:
+                with np.load(self.index_file(column)) as saved:
+                    if str(saved['signature']) != signature or len(saved['ids']) != len(df):
+                        raise ValueError("index is out of date")
+                    index = sorted_index(np.array([], dtype=df[column].dtype), np.array([], dtype='int64'))
+                    index.keys, index.ids = saved['keys'], saved['ids']
+            except (OSError, ValueError, KeyError):
+                index = sorted_index(df[column].values, df.index.values)
+                csv_file._indexes_dirty.add(column)
+            csv_file._indexes[column] = index
+        return csv_file._indexes[column]
+
+    @classmethod
+    def save_indexes(self):
+        # Write changed indexes next to data.csv, tagged with the ledger version they describe.
+        # Runs at exit, so adds, edits and deletes only pay for the in-memory update.
+        with csv_file._lock:
+            if not csv_file._indexes_dirty or csv_file._cache_key is None:
+                return
+            try:
+                if csv_file._cache_key != self.ledger_signature():
+                    return # changed behind our back, the next run rebuilds
+                self.load(copy=False) # fold pending appends into the indexes first
+                for column in csv_file._indexes_dirty:
+                    index = csv_file._indexes[column]
+                    with open(self.index_file(column), 'wb') as out:
+                        np.savez(out, keys=index.keys, ids=index.ids, signature=json.dumps(csv_file._cache_key))
+                csv_file._indexes_dirty = set()
+            except OSError:
+                pass
+
+    @classmethod
+    def largest_expenses(self, n=10):
+        # The n biggest expenses, straight off the front of the amount index, biggest first
+        if self.storage():
+            return self.storage().largest_expenses(n)
+        df = self.load(copy=False)
+        index = self.column_index('Amount')
+        expenses = np.searchsorted(index.keys, 0, side='left')
+        return df.loc[index.ids[:min(n, expenses)]].copy()
+
+    @classmethod
+    def query(self, min_amount=None, max_amount=None, start=None, end=None, kind=None):
+        # Typed rows matching every given predicate, amounts are in major units, kind is 'income' or 'expense'
+        if self.storage():
+            return self.storage().query(min_amount=min_amount, max_amount=max_amount, start=start, end=end, kind=kind)
+        df = self.load(copy=False)
+        if start is not None or end is not None:
+            # Binary search the date index and only look at the block in range, kept in file order
+            ids = self.column_index('Date').range(
+                None if start is None else np.datetime64(pd.Timestamp(start)),
+                None if end is None else np.datetime64(pd.Timestamp(end)))
+            df = df.loc[np.sort(ids)]
+            start = end = None
+        elif min_amount is not None or max_amount is not None:
+            # Same for the amount index
+            ids = self.column_index('Amount').range(
+                None if min_amount is None else self.minor(min_amount),
+                None if max_amount is None else self.minor(max_amount))
+            df = df.loc[np.sort(ids)]
+            min_amount = max_amount = None
+        mask = pd.Series(True, index=df.index)
+        if min_amount is not None:
+            mask &= df['Amount'] >= self.minor(min_amount)
+        if max_amount is not None:
+            mask &= df['Amount'] <= self.minor(max_amount)
+        if start is not None:
+            mask &= df['Date'] >= pd.Timestamp(start)
+        if end is not None:
+            mask &= df['Date'] <= pd.Timestamp(end)
+        if kind == 'income':
+            mask &= df['Amount'] > 0
+        elif kind == 'expense':
+            mask &= df['Amount'] < 0
+        return df[mask].copy()
+
+    @classmethod
+    def totals(self, **filters):
+        # Income, expenses, net (in major units) and transaction counts for the rows query() would return
+        if self.storage() and not self.BASE_CURRENCY:
+            return self.storage().totals(**filters)
+        if not filters:
+            sums = self.rollup('day')[self.ROLLUP_COLUMNS].sum()
+            return {
+                'Income': self.major(int(sums['Income'])),
+                'Expenses': self.major(int(sums['Expenses'])),
+                'Net': self.major(int(sums['Net'])),
+                'IncomeCount': int(sums['IncomeCount']),
+                'ExpenseCount': int(sums['ExpenseCount'])
+            }
+        # sums are taken in integer minor units and only converted at the end
+        rows = self.query(**filters)
+        if self.BASE_CURRENCY:
+            from fx import fx
+            rows = fx.convert(rows, self.BASE_CURRENCY)
+        amounts = rows['Amount']
+        income = int(amounts[amounts > 0].sum())
+        expenses = -int(amounts[amounts < 0].sum())
+        return {
+            'Income': self.major(income),
+            'Expenses': self.major(expenses),
+            'Net': self.major(income - expenses),
+            'IncomeCount': int((amounts > 0).sum()),
+            'ExpenseCount': int((amounts < 0).sum())
+        }
+
+    @classmethod
+    def monthly_totals(self):
+        # One row per month in date order: Month, Income, Expenses, Total and the currencies used that month
+        months = self.rollup('month')
+        grouped = months.groupby(months.index.get_level_values('Date'))
+        monthly = self.major(grouped[['Income', 'Expenses', 'Net']].sum()).rename(columns={'Net': 'Total'})
+        currencies = months.index.to_frame(index=False)[['Date', 'Currency']].drop_duplicates() # already sorted
+        monthly['Currency'] = currencies.groupby('Date')['Currency'].agg("/".join)
+        return monthly.reset_index(names='Month')
+
+    @classmethod
+    def monthly_by_currency(self):
+        # Month x currency pivot of Income, Expenses and Net, one column group per currency (never summed across them)
+        months = self.rollup('month')
+        dates = months.index.get_level_values('Date').rename('Month')
+        pivot = months[['Income', 'Expenses', 'Net']].groupby([dates, months.index.get_level_values('Currency')]).sum()
+        pivot = pivot.unstack('Currency', fill_value=0).swaplevel(axis=1).sort_index(axis=1, level=0, sort_remaining=False)
+        return self.major(pivot)
+
+    @classmethod
+    def daily_totals(self):
+        # Income, Expenses and Net per transaction day, indexed by Date
+        series = self.daily_series()
+        return series.loc[series['Count'].values > 0, ['Income', 'Expenses', 'Net']]
+
+    @classmethod
+    def daily_series(self):
+        # Every calendar day from the first transaction to the last, quiet days filled with zeros:
+        # Income, Expenses, Net, running Balance (major units) and Count of transactions.
+        # Built once per ledger version in one bincount pass over the day rollup; treat it as read-only.
+        key = (self.data_version(), self.BASE_CURRENCY)
+        if self.BASE_CURRENCY:
+            from fx import fx
+            key += (fx.signature(),)
+        if csv_file._series is not None and csv_file._series_key == key:
+            return csv_file._series
+        days = self.rollup('day')
+        dates = days.index.get_level_values('Date')
+        if len(days):
+            start = dates.min()
+            offsets = ((dates - start) // pd.Timedelta(days=1)).values.astype('int64')
+            span = int(offsets.max()) + 1
+        else:
+            start, offsets, span = pd.Timestamp.today().normalize(), np.zeros(0, dtype='int64'), 0
+        sums = {column: np.bincount(offsets, weights=days[column].values, minlength=span).round().astype('int64')
+                for column in self.ROLLUP_COLUMNS}
+        series = pd.DataFrame({
+            'Income': self.major(sums['Income']),
+            'Expenses': self.major(sums['Expenses']),
+            'Net': self.major(sums['Net']),
+            'Balance': self.major(np.cumsum(sums['Net'])), # summed in minor units, so no drift over the years
+            'Count': sums['IncomeCount'] + sums['ExpenseCount']
+        }, index=pd.date_range(start, periods=span, freq='D', name='Date'))
+        csv_file._series = series
+        csv_file._series_key = key
+        return series
+
+    @classmethod
+    def rollup_parts(self, df):
+        # Per (Date, Currency, Use) sums in minor units for a typed frame, the building block of the rollups
+        keys = [df['Date'].rename('Date')]
+        for column in ['Currency', 'Use']:
+            labels = df[column].astype('category')
+            if '' not in labels.cat.categories:
+                labels = labels.cat.add_categories('')
+            keys.append(labels.fillna('').rename(column)) # missing labels get their own '' bucket
+        return aggregation.sums(df['Amount'], keys)
+
+    @classmethod
+    def months_of(self, parts):
+        # Day-level parts regrouped to the first day of their month
+        dates = parts.index.get_level_values('Date').to_period('M').to_timestamp()
+        return aggregation.regroup(parts, [dates, parts.index.get_level_values('Currency'), parts.index.get_level_values('Use')])
+
+    @classmethod
+    def rollup_file(self):
+        return self.CSV_FILE + '.rollups'
+
+    @classmethod
+    def rollup_log_file(self):
+        # small changes made since data.csv.rollups was written, one JSON line per ledger version they lead to
+        return self.CSV_FILE + '.rollups.log'
+
+    @classmethod
+    def rollups(self):
+        # Day and month rollups for the current ledger: from memory, from the sidecar and its log, or rebuilt
+        with csv_file._lock:
+            key = self.ledger_signature()
+            if csv_file._rollups is not None and csv_file._rollups_key == key:
+                return csv_file._rollups
+            rollups = self.read_rollups(key)
+            if rollups is not None:
+                # folded in on every load until the sidecar is written again, which is worth it once the log grows
+                log = self.rollup_log_file()
+                csv_file._rollups_dirty = os.path.exists(log) and os.path.getsize(log) > self.ROLLUP_LOG_LIMIT
+            else:
+                days = self.stream_rollup() if self.streaming() else rollup_store.from_parts(self.rollup_parts(self.load(copy=False)))
+                rollups = {'day': days, 'month': days.months()}
+                csv_file._rollups_dirty = True
+            csv_file._rollups = rollups
+            csv_file._rollups_key = key
+            csv_file._rollups_version += 1
+            return rollups
+
+    @classmethod
+    def read_rollups(self, key):
+        # The rollups sidecar brought up to ledger version `key` through its log, or None if they cannot get there
+        try:
+            with np.load(self.rollup_file(), allow_pickle=False) as saved:
+                saved_key = str(saved['signature'])
+                rows = self.read_rollup_log(saved_key, key)
+                if rows is None:
+                    return None
+                rollups = {level: rollup_store.from_arrays(saved, level + '_') for level in ('day', 'month')}
+        except (OSError, ValueError, KeyError):
+            return None
+        if rows:
+            delta = rollup_store.from_rows(rows, drop_empty=False)
+            rollups['day'].merge(delta)
+            rollups['month'].merge(delta.months())
+        return rollups
+
+    @classmethod
+    def read_rollup_log(self, since, key):
+        # Day rows of the logged changes leading from version `since` (a JSON signature) to `key`, None if they do not
+        try:
+            with open(self.rollup_log_file()) as log:
+                entries = [json.loads(line) for line in log if line.endswith("\n")] # a line cut short by a crash is no change
+        except FileNotFoundError:
+            entries = []
+        rows, current = [], since
+        for entry in entries: # entries left over from before the sidecar was last written never match
+            if entry['from'] == current:
+                rows.extend(entry['rows'])
+                current = entry['to']
+        return rows if current == json.dumps(key) else None
+
+    @classmethod
+    def log_rollups(self, before, after, rows):
+        # Record that the ledger went from version `before` to `after` by these day rows ([] when only its files
+        # changed), so the sidecar follows without being read and rewritten: one short append, even for huge ledgers
+        if not os.path.exists(self.rollup_file()):
+            return # nothing to bring up to date
+        try:
+            with open(self.rollup_log_file(), 'a') as log:
+                log.write(json.dumps({'from': json.dumps(before), 'to': json.dumps(after), 'rows': rows}) + "\n")
+        except OSError:
+            pass
+
+    @classmethod
+    def data_version(self):
+        # Changes whenever the ledger does, whichever backend holds it
+        if self.storage():
+            self.storage().connect() # creates data.db on first use
+            return self.file_signature(self.storage().DB_FILE)
+        return self.ledger_signature()
+
+    @classmethod
+    def rollup(self, level):
+        # 'day' or 'month' rollup as a frame indexed by (Date, Currency, Use), sums in minor units.
+        # Its size depends on the number of days/months, categories and currencies, not on transactions.
+        if self.BASE_CURRENCY: # months are built from converted days, rates change within a month
+            from fx import fx
+            days = fx.base_rollup(self.BASE_CURRENCY)
+            return days if level == 'day' else self.months_of(days)
+        return self.native_rollup(level)
+
+    @classmethod
+    def native_rollup(self, level):
+        # rollup() with every amount left in its own currency
+        if self.storage():
+            return self.storage().rollup(level)
+        store = self.rollups()[level]
+        key = (level, csv_file._rollups_version)
+        if key in csv_file._rollup_frames:
+            return csv_file._rollup_frames[key]
+        frame = store.frame(self.ROLLUP_COLUMNS)
+        frames = {other: value for other, value in csv_file._rollup_frames.items() if other[1] == key[1]}
+        frames[key] = frame
+        csv_file._rollup_frames = frames # only frames of the current rollups are kept
+        return frame
+
+    @classmethod
+    def update_rollups(self, days, before, after):
+        # The ledger went from version `before` to `after` by these signed day parts (rollup_parts of the rows
+        # added, negated for rows taken away; None when only its files changed). Rollups in memory follow in one
+        # vectorized merge and tell their hooks, the sidecar follows through its log; neither is rebuilt.
+        delta = rollup_store.from_parts(days, drop_empty=False) if days is not None else None
+        if csv_file._rollups is not None and csv_file._rollups_key == before:
+            csv_file._rollups_key = after
+            if delta is not None:
+                csv_file._rollups['day'].merge(delta)
+                csv_file._rollups['month'].merge(delta.months())
+                version = csv_file._rollups_version
+                csv_file._rollups_version += 1
+                for hook in csv_file._rollup_hooks: # hooks in step with version follow the change instead of rebuilding
+                    hook(days, version)
+            if csv_file._rollups_dirty:
+                return # the whole sidecar is written at exit anyway
+        self.log_rollups(before, after, delta.rows() if delta is not None else [])
+
+    @classmethod
+    def label(self, value):
+        # A Currency or Use as the rollups key it, like rollup_parts: missing (None, NaN, empty) is ''
+        if value is None or value != value:
+            return ''
+        return str(value)
+
+    @classmethod
+    def row_parts(self, rows):
+        # rollup_parts for freshly appended rows (dicts with standardized dates) in plain python, as rollup log rows,
+        # so a one-off add never imports pandas or numpy
+        buckets = {}
+        for row in rows:
+            amount = self.minor(row['Amount'])
+            day, month, year = row['Date'].split('-')
+            values = buckets.setdefault((f"{year}-{month}-{day}", self.label(row['Currency']), self.label(row['Use'])), [0] * 5)
+            for position, value in enumerate((max(amount, 0), max(-amount, 0), amount, int(amount > 0), int(amount < 0))):
+                values[position] += value
+        return [list(key) + values for key, values in buckets.items()]
+
+    @classmethod
+    def save_rollups(self):
+        # Rebuilt (or long-logged) rollups are written whole at exit; everything else already went to the log
+        with csv_file._lock:
+            if not csv_file._rollups_dirty or csv_file._rollups is None:
+                return
+            try:
+                if csv_file._rollups_key != self.ledger_signature():
+                    return
+                arrays = {'signature': json.dumps(csv_file._rollups_key)}
+                for level, store in csv_file._rollups.items():
+                    arrays.update(store.arrays(level + '_'))
+                temp_file = self.rollup_file() + '.tmp'
+                with open(temp_file, 'wb') as out:
+                    np.savez(out, **arrays)
+                os.replace(temp_file, self.rollup_file())
+                if os.path.exists(self.rollup_log_file()):
+                    os.remove(self.rollup_log_file()) # all in the sidecar now
+                csv_file._rollups_dirty = False
+            except OSError:
+                pass
+
+    @classmethod
+    def streaming(self):
+        # Rollups are built from data.csv in chunks when it is too big to load and is not cached already
+        if self.storage():
+            return False
+        if csv_file._cache is not None and csv_file._cache_key == self.ledger_signature():
+            return False
+        return os.path.getsize(self.CSV_FILE) > self.STREAM_THRESHOLD
+
+    @classmethod
+    def stream_rollup(self, chunksize=None):
+        # Day rollup from one pass over data.csv in fixed-size chunks, each merged into the store as it goes.
+        # Peak memory depends on the chunk size and the number of buckets, not on the file size.
+        deleted, edits = self.read_patches()
+        days = rollup_store.from_parts(self.rollup_parts(self.typed(pd.DataFrame(columns=self.Columns))))
+        chunks = pd.read_csv(self.CSV_FILE, chunksize=chunksize or self.CHUNK_ROWS, usecols=['Date', 'Amount', 'Currency', 'Use'])
+        for chunk in chunks: # chunk indexes carry on from each other, so they are still row positions
+            chunk.index = self.row_ids(chunk.index[0], len(chunk)) if len(chunk) else chunk.index
+            chunk = self.apply_patches(self.typed(chunk), deleted, edits)
+            days.merge(rollup_store.from_parts(self.rollup_parts(chunk)))
+        return days
+
+    @classmethod
+    def write_patch(self, entry):
+        # Record one delete or edit without touching data.csv.
+        with csv_file._lock:
+            before = self.ledger_signature()
+            rolled = csv_file._rollups is not None and csv_file._rollups_key == before
+            # the old row is needed to take it out of the rollups, also when only their sidecar has them
+            cached = (csv_file._cache is not None and csv_file._cache_key == before) or rolled or os.path.exists(self.rollup_file())
+            if cached:
+                self.load(copy=False) # fold pending appends in before patching the cache
+
+            with open(self.patch_file(), 'a') as log:
+                log.write(json.dumps(entry) + "\n")
+                log.flush()
+                os.fsync(log.fileno())
+
+            if cached:
+                row = entry['row']
+                old = csv_file._cache.loc[row] if row in csv_file._cache.index else None
+                old_row = csv_file._cache.loc[[row]] if old is not None else None
+                deleted = {row} if entry['op'] == 'delete' else set()
+                edits = {row: entry['values']} if entry['op'] == 'edit' else {}
+                csv_file._cache = self.apply_patches(csv_file._cache, deleted, edits)
+                csv_file._cache_key = self.ledger_signature()
+
+                # The rollups only change by this one row
+                days = None
+                if old_row is not None:
+                    days = -self.rollup_parts(old_row)
+                    if entry['op'] == 'edit':
+                        days = pd.concat([days, self.rollup_parts(csv_file._cache.loc[[row]])])
+                self.update_rollups(days, before, csv_file._cache_key)
+
+                # Move the row within each index instead of rebuilding it
+                if old is not None:
+                    for column, index in csv_file._indexes.items():
+                        if entry['op'] == 'delete' or column in entry['values']:
+                            index.remove(np.array(old[column]).astype(index.keys.dtype), row)
+                            csv_file._indexes_dirty.add(column)
+                        if entry['op'] == 'edit' and column in entry['values']:
+                            index.insert(csv_file._cache.loc[[row], column].values, np.array([row]))
+
+            if os.path.getsize(self.patch_file()) > self.PATCH_LIMIT:
+                # not a daemon: the interpreter waits for it at exit instead of killing it mid-swap
+                threading.Thread(target=self.compact).start()
+
+    @classmethod
+    def delete_row(self, row_id):
+        if self.storage():
+            return self.storage().delete_row(row_id)
+        self.write_patch({'op': 'delete', 'row': int(row_id)})
+
+    @classmethod
+    def edit_row(self, row_id, values):
+        # values maps column names to their new value, dates are standardized here
+        values = dict(values)
+        if 'Date' in values:
+            values['Date'] = self.standardize_date(values['Date'])
+        if 'Amount' in values:
+            values['Amount'] = self.amount(values['Amount'])
+        if self.storage():
+            return self.storage().edit_row(row_id, values)
+        self.write_patch({'op': 'edit', 'row': int(row_id), 'values': values})
+
+    @classmethod
+    def compact(self):
+        # Merge the patch log into data.csv and start a new, empty log. Row ids stay the same.
+        # Crash-safe: the new data.csv and data.csv.ids are written beside the old ones first, then retiring the
+        # log commits the swap, which finish_compaction() completes (now, or on the next start after a crash).
+        with csv_file._lock:
+            if not os.path.exists(self.patch_file()):
+                return
+            df = self.load(copy=False)
+            before = self.ledger_signature()
+            next_id = int(self.row_ids(csv_file._cache_rows, 1)[0]) # ids of deleted rows are never handed out again
+            temp_file = self.CSV_FILE + '.tmp'
+            with open(temp_file, 'w', newline='') as out:
+                df.assign(Amount=self.major(df['Amount'])).to_csv(out, index=False, columns=self.Columns, date_format="%d-%m-%Y")
+                out.flush()
+                os.fsync(out.fileno())
+            with open(self.id_file() + '.tmp', 'wb') as out:
+                np.savez(out, ids=df.index.values.astype('int64'), next=next_id)
+                out.flush()
+                os.fsync(out.fileno())
+            os.replace(self.patch_file(), self.patch_file() + '.merged')
+            self.finish_compaction()
+            self.mark_canonical()
+
+            csv_file._cache_rows = len(df)
+            csv_file._indexes_dirty = set(csv_file._indexes) # same rows and ids, only the signature they carry changed
+            csv_file._cache_key = self.ledger_signature()
+            self.update_rollups(None, before, csv_file._cache_key) # same transactions, so the rollups still hold
+
+    @classmethod
+    def has_sentinel(self):
+        # Whether the ledger still only holds the placeholder row, without reading the whole ledger.
+        # The flag in the sidecar only counts for the data.csv it was written for, anything else is peeked at again.
+        deleted, edits = self.read_patches()
+        if 0 in deleted or 0 in edits:
+            return False # the placeholder was edited into a real transaction, or deleted by hand
+        meta = self.read_meta()
+        signature = list(self.file_signature())
+        if 'sentinel' in meta and meta.get('sentinel_of') == signature:
+            return meta['sentinel']
+
+        # Older files have no sidecar yet, and a file changed outside the app needs a fresh look:
+        # peeking at the first two rows is enough
+        with open(self.CSV_FILE, newline='') as csvfile:
+            reader = csv.DictReader(csvfile)
+            first, second = next(reader, None), next(reader, None)
+        sentinel = (first is not None and second is None
+                    and first['Use'] == self.SAMPLE_ROW['Use']
+                    and first['Comment'] == self.SAMPLE_ROW['Comment'])
+        self.write_meta(sentinel=sentinel, sentinel_of=signature)
+        return sentinel
+
+    @classmethod
+    def add_many(self, rows):
+        # Append a batch of rows (dicts keyed by Columns) with one write and one fsync.
+        rows = [dict(row) for row in rows]
+        for row in rows: # checked before anything is written, a bad row must not reach the ledger
+            self.amount(row['Amount'])
+        if self.storage():
+            return self.storage().add_many(rows)
+        if not rows:
+            return 0
+        if len(rows) <= 64: # a handful of rows is quicker one by one than importing pandas for the batch parser
+            dates = [self.standardize_date(row['Date']) for row in rows]
+        else:
+            dates = self.standardize_dates([row['Date'] for row in rows])
+        for row, date in zip(rows, dates):
+            row['Date'] = date
+
+        with csv_file._lock:
+            if not os.path.exists(self.CSV_FILE):
+                self.get_csv(load=False)
+            before = self.ledger_signature()
+            was_canonical = self.read_meta().get('canonical') == list(before[0])
+            sentinel = self.has_sentinel()
+
+            # The placeholder row is dropped by starting the file over, it is the only row in it
+            with open(self.CSV_FILE, 'w' if sentinel else 'a', newline='') as csvfile:
+                writer = csv.DictWriter(csvfile, fieldnames=self.Columns)
+                if sentinel:
+                    writer.writeheader()
+                writer.writerows(rows)
+                csvfile.flush()
+                os.fsync(csvfile.fileno())
+
+            if sentinel:
+                self.write_meta(sentinel=False, sentinel_of=list(self.file_signature()))
+                for stale in (self.patch_file(), self.id_file()):
+                    if os.path.exists(stale):
+                        os.remove(stale) # row ids start over with the file
+            if was_canonical:
+                self.mark_canonical() # the new rows are already standardized
+
+            # Keep the cached ledger and the rollups valid instead of re-reading the file
+            if csv_file._cache is not None and csv_file._cache_key == before and not sentinel:
+                csv_file._cache_tail.extend(rows)
+                csv_file._cache_key = self.ledger_signature()
+            if csv_file._rollups is not None and csv_file._rollups_key == before and not sentinel:
+                self.update_rollups(self.rollup_parts(self.typed(pd.DataFrame(rows, columns=self.Columns))), before, self.ledger_signature())
+            elif not sentinel: # e.g. `main.py add`: only the sidecar has them, and it follows through its log
+                self.log_rollups(before, self.ledger_signature(), self.row_parts(rows))
+        return len(rows)
 
     @classmethod
     def add_data(self, Date, Amount, Currency, Use, Comment):
         # Add a new row of data to the CSV file.
         try:
-            # Standardize the date format
-            standardized_date = self.standardize_date(Date)
-            
             newentry = {
-                'Date': standardized_date,
+                'Date': Date,
                 'Amount': Amount,
                 'Currency': Currency,
                 'Use': Use,
                 'Comment': Comment
             }
-            
-
-            df = self.get_csv()
-            
-            # sample data removal
-            if len(df) == 1 and df.iloc[0]['Use'] == 'Error Handling' and df.iloc[0]['Comment'] == 'This will be added if file is not present to avoid errors. This sample entry will be automatically deleted upon your first entry.':
-                
-                df = df.drop(0)
-                df.to_csv(self.CSV_FILE, index=False)
-            
-            # Add the new entry
-            with open(self.CSV_FILE, 'a', newline='') as csvfile: # opening csv file in append mode.
-                writer = csv.DictWriter(csvfile, fieldnames=self.Columns)
-                writer.writerow(newentry)
+            self.add_many([newentry])
             print(f"Entry Added.")
         except Exception as e:
             print(f"Error adding data: {str(e)}")
 
 
+atexit.register(csv_file.save_indexes)
+atexit.register(csv_file.save_rollups)
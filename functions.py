@@ -1,30 +1,23 @@
 from core import *
+from render import table
 import pandas as pd
 import datetime
 today = datetime.date.today()
 
 def view_data():
     try:
-        csv_file.get_csv() # get the csv file
-        data = pd.read_csv(csv_file.CSV_FILE)
+        data = csv_file.load() # cached ledger with deletes and edits applied
         if data.empty:
             print("No data available.")
         else:
-            print("\nCurrent Data Summary:")
-            print("=" * 100)
-            print(f"{'Date':<12} {'Amount':>10} {'Currency':>10} {'Type':>10} {'Use':<30} {'Comment':<30}")
-            print("-" * 100)
-            
-            for _, row in data.iterrows():
-                type_str = "Income" if row['Amount'] > 0 else "Expense"
-                print(f"{row['Date']:<12} {row['Amount']:>10.2f} {row['Currency']:>10} {type_str:>10} {row['Use']:<30} {row['Comment']:<30}")
-            
-            print("=" * 100)
+            # Only the rows on the current page are formatted and written
+            table.browse(data, "Current Data Summary:", comment=True)
             
             # Calculate and display summary
-            total_income = data[data["Amount"] > 0]["Amount"].sum()
-            total_expense = abs(data[data["Amount"] < 0]["Amount"].sum())
-            net_savings = total_income - total_expense
+            totals = csv_file.totals() # summed in minor units, so no float drift
+            total_income = totals['Income']
+            total_expense = totals['Expenses']
+            net_savings = totals['Net']
             
             print("\nSummary:")
             print("-" * 50)
@@ -139,33 +132,21 @@ def Currency_call(): # specifying Currency
 
 def delete_transaction():
     try:
-        csv_file.get_csv()
-        data = pd.read_csv(csv_file.CSV_FILE)
+        data = csv_file.load() # the index holds each row's id in the patch log
         
         if data.empty:
             print("No data available to delete.")
             return
         
-        # Display current data
-        print("\nCurrent Transactions:")
-        print("=" * 100)
-        print(f"{'Index':<6} {'Date':<12} {'Amount':>10} {'Currency':>10} {'Type':>10} {'Use':<30}")
-        print("-" * 100)
-        
-        for idx, row in data.iterrows():
-            type_str = "Income" if row['Amount'] > 0 else "Expense"
-            print(f"{idx:<6} {row['Date']:<12} {row['Amount']:>10.2f} {row['Currency']:>10} {type_str:>10} {row['Use']:<30}")
-        
-        print("=" * 100)
-        
-        # Get index to delete
+        # Get index to delete, paging through the transactions instead of printing all of them
         while True:
             try:
-                idx = int(input("\nEnter the index of the transaction to delete (or -1 to cancel): "))
+                idx = int(table.browse(data, "Current Transactions:", index=True,
+                                       prompt="\nEnter the index of the transaction to delete, n/p/g <page> to browse (or -1 to cancel): "))
                 if idx == -1:
                     print("Deletion cancelled.")
                     return
-                if idx < 0 or idx >= len(data):
+                if idx not in data.index:
                     print("Invalid index. Please try again.")
                     continue
                 break
@@ -179,9 +160,8 @@ def delete_transaction():
             print("Deletion cancelled.")
             return
         
-        # Delete the transaction
-        data = data.drop(idx)
-        data.to_csv(csv_file.CSV_FILE, index=False)
+        # Delete the transaction, only a small entry is written to the patch log
+        csv_file.delete_row(idx)
         print("Transaction deleted successfully!")
         
     except Exception as error:
@@ -189,33 +169,21 @@ def delete_transaction():
 
 def edit_transaction():
     try:
-        csv_file.get_csv()
-        data = pd.read_csv(csv_file.CSV_FILE)
+        data = csv_file.load() # the index holds each row's id in the patch log
         
         if data.empty:
             print("No data available to edit.")
             return
         
-        # Display current data
-        print("\nCurrent Transactions:")
-        print("=" * 100)
-        print(f"{'Index':<6} {'Date':<12} {'Amount':>10} {'Currency':>10} {'Type':>10} {'Use':<30}")
-        print("-" * 100)
-        
-        for idx, row in data.iterrows():
-            type_str = "Income" if row['Amount'] > 0 else "Expense"
-            print(f"{idx:<6} {row['Date']:<12} {row['Amount']:>10.2f} {row['Currency']:>10} {type_str:>10} {row['Use']:<30}")
-        
-        print("=" * 100)
-        
-        # Get index to edit
+        # Get index to edit, paging through the transactions instead of printing all of them
         while True:
             try:
-                idx = int(input("\nEnter the index of the transaction to edit (or -1 to cancel): "))
+                idx = int(table.browse(data, "Current Transactions:", index=True,
+                                       prompt="\nEnter the index of the transaction to edit, n/p/g <page> to browse (or -1 to cancel): "))
                 if idx == -1:
                     print("Edit cancelled.")
                     return
-                if idx < 0 or idx >= len(data):
+                if idx not in data.index:
                     print("Invalid index. Please try again.")
                     continue
                 break
@@ -225,23 +193,26 @@ def edit_transaction():
         
         # Get new values
         print("\nEnter new values (press Enter to keep current value):")
+        current = data.loc[idx]
+        current_date = current['Date'].strftime('%d-%m-%Y')
+        current_amount = csv_file.major(current['Amount'])
         
         # Date
-        new_date = input(f"Date [{data.iloc[idx]['Date']}]: ").strip()
+        new_date = input(f"Date [{current_date}]: ").strip()
         if not new_date:
-            new_date = data.iloc[idx]['Date']
+            new_date = current_date
         else:
             try:
                 new_date = csv_file.standardize_date(new_date)
             except ValueError as e:
                 print(f"Invalid date format. {str(e)}")
                 print("Keeping current date.")
-                new_date = data.iloc[idx]['Date']
+                new_date = current_date
         
         # Amount
-        new_amount = input(f"Amount [{data.iloc[idx]['Amount']}]: ").strip()
+        new_amount = input(f"Amount [{current_amount}]: ").strip()
         if not new_amount:
-            new_amount = data.iloc[idx]['Amount']
+            new_amount = current_amount
         else:
             try:
                 new_amount = float(new_amount)
@@ -254,29 +225,34 @@ def edit_transaction():
                         new_amount = abs(new_amount)
                     else:
                         print("Invalid transaction type. Keeping current value.")
-                        new_amount = data.iloc[idx]['Amount']
+                        new_amount = current_amount
             except ValueError:
                 print("Invalid amount format. Keeping current value.")
-                new_amount = data.iloc[idx]['Amount']
+                new_amount = current_amount
         
         # Currency
-        new_currency = input(f"Currency [{data.iloc[idx]['Currency']}]: ").strip().upper()
+        new_currency = input(f"Currency [{current['Currency']}]: ").strip().upper()
         if not new_currency:
-            new_currency = data.iloc[idx]['Currency']
+            new_currency = current['Currency']
         
         # Use
-        new_use = input(f"Use [{data.iloc[idx]['Use']}]: ").strip()
+        new_use = input(f"Use [{current['Use']}]: ").strip()
         if not new_use:
-            new_use = data.iloc[idx]['Use']
+            new_use = current['Use']
         
         # Comment
-        new_comment = input(f"Comment [{data.iloc[idx]['Comment']}]: ").strip()
+        new_comment = input(f"Comment [{current['Comment']}]: ").strip()
         if not new_comment:
-            new_comment = data.iloc[idx]['Comment']
+            new_comment = current['Comment']
         
-        # Update the transaction
-        data.iloc[idx] = [new_date, new_amount, new_currency, new_use, new_comment]
-        data.to_csv(csv_file.CSV_FILE, index=False)
+        # Update the transaction, only a small entry is written to the patch log
+        csv_file.edit_row(idx, {
+            'Date': new_date,
+            'Amount': new_amount,
+            'Currency': new_currency,
+            'Use': new_use,
+            'Comment': new_comment
+        })
         print("Transaction updated successfully!")
         
     except Exception as error:
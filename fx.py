@@ -0,0 +1,120 @@
+from core import csv_file
+from aggregation import aggregation
+import pandas as pd
+import numpy as np
+import os
+import sys
+
+class fx: # Converts amounts into one base currency with a local table of exchange rates.
+    RATES_FILE = os.environ.get('FINANCES_RATES', 'rates.csv') # Date, Currency, Rate rows
+    REFERENCE = os.environ.get('FINANCES_RATES_REFERENCE', 'PKR').upper() # Rate is the value of one unit of Currency in this
+    _rates = None # parsed rate table
+    _rates_key = None # file signature it was read from
+    _converted = {} # (data version, rates signature, base) -> day rollup in the base currency
+
+    @classmethod
+    def signature(self):
+        # Changes whenever the rate table does, None while there is none
+        return csv_file.file_signature(self.RATES_FILE) if os.path.exists(self.RATES_FILE) else None
+
+    @classmethod
+    def rates(self):
+        # Rate table sorted by date, re-read only when the file changes
+        key = self.signature()
+        if fx._rates is None or fx._rates_key != key:
+            if key is None:
+                rates = pd.DataFrame({'Date': pd.Series(dtype='datetime64[ns]'), 'Currency': pd.Series(dtype=object), 'Rate': pd.Series(dtype='float64')})
+            else:
+                rates = pd.read_csv(self.RATES_FILE, usecols=['Date', 'Currency', 'Rate'])
+                rates['Date'] = pd.to_datetime(csv_file.standardize_dates(rates['Date']), format="%d-%m-%Y")
+                rates['Currency'] = rates['Currency'].astype(str).str.strip().str.upper()
+                rates['Rate'] = rates['Rate'].astype('float64')
+                rates = rates.dropna().sort_values('Date', kind='stable').reset_index(drop=True)
+            fx._rates = rates
+            fx._rates_key = key
+        return fx._rates
+
+    @classmethod
+    def as_of(self, dates, currencies, early=None):
+        # Latest rate on or before each date for each currency, in one as-of join.
+        # Dates before a currency's first quote fall back to that first quote; when given, `early` collects
+        # currency -> (earliest such date, first quote) so the caller can warn about it.
+        frame = pd.DataFrame({
+            'Date': np.asarray(dates, dtype='datetime64[ns]'),
+            'Currency': currencies,
+            'Position': np.arange(len(dates))
+        }).sort_values('Date', kind='stable')
+        rates = self.rates()
+        frame['Currency'] = frame['Currency'].astype(str)
+        rates = rates.astype({'Date': frame['Date'].dtype, 'Currency': str}) # by= keys must share a dtype, even with no rates
+        joined = pd.merge_asof(frame, rates, on='Date', by='Currency', direction='backward')
+        missing = joined['Rate'].isna().values
+        if missing.any():
+            earlier = pd.merge_asof(frame[missing], rates, on='Date', by='Currency', direction='forward')
+            joined.loc[missing, 'Rate'] = earlier['Rate'].values
+            fallback = earlier[earlier['Rate'].notna() & (earlier['Currency'] != self.REFERENCE)]
+            if early is not None:
+                for currency, dates in fallback.groupby('Currency')['Date']:
+                    first = rates.loc[rates['Currency'] == currency, 'Date'].min()
+                    early[currency] = (min(dates.min(), early.get(currency, (first,))[0]), first)
+        result = np.empty(len(frame))
+        result[joined['Position'].values] = joined['Rate'].values
+        result[currencies == self.REFERENCE] = 1.0 # needs no rows of its own
+        return result
+
+    @classmethod
+    def factors(self, dates, currencies, base):
+        # Multiplier taking each amount from its own currency into the base currency.
+        # Rates are looked up once per distinct (date, currency) pair and spread back over the rows.
+        base = base.upper()
+        codes, pairs = aggregation.group_codes([pd.Index(dates, name='Date'), pd.Index(currencies, name='Currency')])
+        dates = pairs.get_level_values('Date').values
+        currencies = pd.Series(pairs.get_level_values('Currency'), dtype=object).fillna('').astype(str).str.upper().values
+        early = {}
+        own = self.as_of(dates, currencies, early)
+        target = self.as_of(dates, np.full(len(currencies), base, dtype=object), early)
+        factors = own / target
+        for currency, (date, first) in sorted(early.items()):
+            print(f"Warning: no {currency} rate on or before {date:%d-%m-%Y}, its first rate ({first:%d-%m-%Y}) is used for earlier dates", file=sys.stderr)
+        unlabelled = currencies == ''
+        if unlabelled.any():
+            print(f"Warning: transactions without a currency on {len(set(dates[unlabelled]))} day(s) are counted as {base}", file=sys.stderr)
+        factors[(currencies == base) | unlabelled] = 1.0 # unlabelled amounts are taken to be in the base currency
+        unknown = np.isnan(factors)
+        if unknown.any():
+            names = set(currencies[unknown & np.isnan(own)]) | ({base} if np.isnan(target).any() else set())
+            raise ValueError(f"No exchange rate for {', '.join(sorted(names))} in {self.RATES_FILE}")
+        return factors[codes]
+
+    @classmethod
+    def convert(self, df, base):
+        # Typed rows with Amount (minor units) converted into the base currency and Currency set to it
+        converted = df.copy()
+        factors = self.factors(df['Date'].values, df['Currency'], base)
+        converted['Amount'] = np.rint(df['Amount'].values * factors).astype('int64')
+        converted['Currency'] = pd.Categorical.from_codes(np.zeros(len(df), dtype='int8'), [base.upper()])
+        return converted
+
+    @classmethod
+    def base_rollup(self, base):
+        # Day rollup with every currency converted into the base one, cached per ledger version and rate table.
+        # Conversion runs over (day, currency, use) buckets, so its cost does not grow with transactions.
+        key = (csv_file.data_version(), self.signature(), base.upper())
+        if key in fx._converted:
+            return fx._converted[key]
+        days = csv_file.native_rollup('day')
+        dates = days.index.get_level_values('Date')
+        factors = self.factors(dates.values, days.index.get_level_values('Currency'), base)
+        income = np.rint(days['Income'].values * factors).astype('int64')
+        expenses = np.rint(days['Expenses'].values * factors).astype('int64')
+        converted = pd.DataFrame({
+            'Income': income,
+            'Expenses': expenses,
+            'Net': income - expenses,
+            'IncomeCount': days['IncomeCount'].values,
+            'ExpenseCount': days['ExpenseCount'].values
+        }, index=days.index)
+        keys = [dates, pd.Index([base.upper()] * len(days), name='Currency'), days.index.get_level_values('Use')]
+        converted = aggregation.regroup(converted, keys)
+        fx._converted = {key: converted} # only the latest version is worth keeping
+        return converted
@@ -4,499 +4,527 @@ from datetime import datetime
 import csv
 import matplotlib.pyplot as plt
 from Filter_data import filter
+from concurrent.futures import ProcessPoolExecutor
+from sampling import sampling
+import matplotlib
+import hashlib
+import shutil
+import types
 import os
 import numpy as np
 
+def render_chart(name, data, path, dpi=300): # draws one chart into the cache, also runs in render_all's workers
+    plt.switch_backend('Agg')
+    getattr(graphing, graphing.CHARTS[name][0])(*data)
+    store_figure(path, dpi)
+    plt.close('all')
+    return path
+
+def store_figure(path, dpi=300): # saves the current figure into the cache
+    temp_file = f"{path}.{os.getpid()}.tmp{os.path.splitext(path)[1]}"
+    plt.savefig(temp_file, bbox_inches='tight', dpi=dpi)
+    os.replace(temp_file, path) # a half-written file never looks like a cache hit
+    return path
+
 class graphing(csv_file):
+    # chart name -> (plot method, file in reports/). The plot_* methods only draw from the
+    # pre-aggregated data they are given, so render_all can hand them to worker processes.
+    CHARTS = {
+        'trends': ('plot_trends', 'trends_over_time.png'),
+        'monthly': ('plot_monthly', 'monthly_trends.png'),
+        'currency': ('plot_currency', 'currency_distribution.png'),
+        'ratio': ('plot_ratio', 'income_expense_ratio.png'),
+        'use-cases': ('plot_use_cases', 'use_cases_distribution.png'),
+        'use-cases-by-type': ('plot_use_cases_by_type', 'use_cases_by_type.png'),
+        'predictions': ('plot_predictions', 'future_predictions.png'),
+        'comparison': ('plot_comparison', 'prediction_comparison.png')
+    }
+    CHART_CACHE = os.path.join('reports', '.cache') # rendered charts named by the hash of everything that went into them
+    CHART_CACHE_LIMIT = int(os.environ.get('FINANCES_CHART_CACHE_MB', 64)) * 1024 * 1024 # least recently used go first
+    CHART_CACHE_VERSION = 1 # bump when a chart changes in a way the hashed code and settings cannot see
+    WINDOW_SETTINGS = {'backend', 'backend_fallback', 'interactive', 'toolbar', 'figure.raise_window'} # shown or saved, the file is the same
+
+    @classmethod
+    def transaction_counts(self):
+        # Transactions per currency and per use (all, income only, expense only), summed from the day rollups
+        days = self.native_rollup('day')
+        counts = days['IncomeCount'] + days['ExpenseCount']
+        by_use = days[['IncomeCount', 'ExpenseCount']].groupby(days.index.get_level_values('Use')).sum()
+        by_use = by_use[by_use.index != ''] # rows without a use were never counted
+        return {
+            'Currency': counts.groupby(days.index.get_level_values('Currency')).sum().sort_values(ascending=False),
+            'Use': (by_use['IncomeCount'] + by_use['ExpenseCount']).sort_values(ascending=False),
+            'IncomeUse': by_use['IncomeCount'],
+            'ExpenseUse': by_use['ExpenseCount']
+        }
+
+    @classmethod
+    def chart_data(self, name, days=30):
+        # Plot arguments for one chart, None when there is nothing to draw (e.g. predictions failed)
+        if name == 'trends':
+            return (self.daily_series(),)
+        if name == 'monthly':
+            return (self.monthly_totals(),)
+        if name == 'ratio':
+            return (self.totals(),)
+        if name in ('currency', 'use-cases'):
+            return (self.transaction_counts()['Currency' if name == 'currency' else 'Use'],)
+        if name == 'use-cases-by-type':
+            return (self.transaction_counts(),)
+        from predictions import predictions
+        if name == 'predictions':
+            return predictions.predict_future(days)
+        return predictions.compare_predictions_with_actual(days)
+
+    @classmethod
+    def report_data(self, days=30):
+        # Everything the charts need, aggregated once in this process: chart name -> plot arguments
+        data = {name: self.chart_data(name, days) for name in self.CHARTS}
+        return {name: arguments for name, arguments in data.items() if arguments is not None}
+
+    @classmethod
+    def fingerprint(self, value, digest):
+        # Feed a stable description of value (frames, arrays, dicts, code...) into a hashlib digest
+        if isinstance(value, (pd.DataFrame, pd.Series)):
+            columns = list(value.columns) if isinstance(value, pd.DataFrame) else [value.name]
+            digest.update(repr((type(value).__name__, columns, list(value.index.names), str(value.dtypes))).encode())
+            digest.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+        elif isinstance(value, np.ndarray):
+            digest.update(repr((value.dtype.str, value.shape)).encode())
+            digest.update(np.ascontiguousarray(value).tobytes())
+        elif isinstance(value, dict):
+            digest.update(f"dict{len(value)}".encode())
+            for key, item in value.items():
+                digest.update(repr(key).encode())
+                self.fingerprint(item, digest)
+        elif isinstance(value, (list, tuple)):
+            digest.update(f"{type(value).__name__}{len(value)}".encode())
+            for item in value:
+                self.fingerprint(item, digest)
+        elif isinstance(value, types.CodeType): # the drawing code itself, so an edited chart is never served stale
+            digest.update(value.co_code)
+            digest.update(repr(value.co_names).encode()) # attributes and globals it uses, e.g. ax.bar vs ax.plot
+            self.fingerprint(value.co_consts, digest)
+        else:
+            digest.update(repr(value).encode())
+
+    @classmethod
+    def cache_file(self, name, data, path, dpi=300):
+        # Where the chart for exactly this data and these settings lives in the cache (format from path)
+        extension = os.path.splitext(path)[1].lower() or '.png'
+        digest = hashlib.sha256()
+        method = getattr(self, self.CHARTS[name][0])
+        code = [method.__code__, render_chart.__code__, sampling.thin.__code__, sampling.lttb.__code__] # and the helpers it draws through
+        style = {key: value for key, value in matplotlib.rcParams.items() if key not in self.WINDOW_SETTINGS} # matplotlibrc and style sheets
+        self.fingerprint((self.CHART_CACHE_VERSION, name, dpi, extension, sampling.POINTS, matplotlib.__version__, style, code, data), digest)
+        return os.path.join(self.CHART_CACHE, digest.hexdigest() + extension)
+
+    @classmethod
+    def publish(self, cached, path):
+        # Copy a cached chart to where it was asked for and mark it as recently used
+        os.utime(cached)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copyfile(cached, path)
+        return path
+
+    @classmethod
+    def evict(self):
+        # Keep the cache under CHART_CACHE_LIMIT bytes, least recently used first. Returns the files removed.
+        try:
+            files = [os.path.join(self.CHART_CACHE, file) for file in os.listdir(self.CHART_CACHE)]
+        except FileNotFoundError:
+            return 0
+        files = sorted((os.stat(file).st_mtime_ns, os.path.getsize(file), file) for file in files if os.path.isfile(file))
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for _, size, file in files:
+            if total <= self.CHART_CACHE_LIMIT:
+                break
+            os.remove(file)
+            total -= size
+            removed += 1
+        return removed
+
+    @classmethod
+    def save_chart(self, name, data, path, dpi=300):
+        # Save one chart to path, reusing the cached render when the inputs are identical. Returns (path, hit).
+        cached = self.cache_file(name, data, path, dpi)
+        hit = os.path.exists(cached)
+        if not hit:
+            os.makedirs(self.CHART_CACHE, exist_ok=True)
+            render_chart(name, data, cached, dpi)
+        self.publish(cached, path)
+        self.evict()
+        return path, hit
+
+    @classmethod
+    def render_all(self, folder='reports', days=30, workers=None, dpi=300):
+        # Headless report pack: every chart saved to folder, no prompts or windows.
+        # Charts whose inputs did not change come from the cache, only the rest are drawn, in parallel.
+        data = self.report_data(days)
+        os.makedirs(self.CHART_CACHE, exist_ok=True)
+        jobs = {name: os.path.join(folder, self.CHARTS[name][1]) for name in self.CHARTS if name in data}
+        cached = {name: self.cache_file(name, data[name], path, dpi) for name, path in jobs.items()}
+        misses = [name for name in jobs if not os.path.exists(cached[name])]
+        if misses:
+            with ProcessPoolExecutor(max_workers=workers or min(len(misses), os.cpu_count() or 1)) as pool:
+                for future in [pool.submit(render_chart, name, data[name], cached[name], dpi) for name in misses]:
+                    future.result()
+        saved = {name: {'File': self.publish(cached[name], path), 'Cache': 'miss' if name in misses else 'hit'}
+                 for name, path in jobs.items()}
+        self.evict()
+        return saved
+
+    @classmethod
+    def finish(self, name, data, label, question="Do you want to save the plot?(y,n):"):
+        # Asks whether to save the figure drawn from data to its file in reports/, then shows it.
+        # Saved through the chart cache like save_chart, so an unchanged chart is copied instead of written again.
+        path = os.path.join('reports', self.CHARTS[name][1])
+        while True:
+            save = input(question).lower()
+            if save == "y":
+                cached = self.cache_file(name, data, path)
+                if not os.path.exists(cached): # the figure on screen is the one to keep
+                    os.makedirs(self.CHART_CACHE, exist_ok=True)
+                    store_figure(cached)
+                self.publish(cached, path)
+                self.evict()
+                print(f"{label} visualization saved to '{path}'")
+                break
+            elif save == "n":
+                break
+
+        plt.show()
+        plt.close()
+
+    @classmethod
+    def plot_trends(self, daily):
+        # Create figure with two subplots
+        fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(16, 10), height_ratios=[3, 1], constrained_layout=True)
+        
+        # Calculate and plot data
+        Income = daily['Income']
+        Expense = -daily['Expenses']
+        
+        # Plot income and expenses
+        # Long histories are thinned to sampling.POINTS per line, peaks and troughs kept
+        ax1.plot(*sampling.thin(Income.index, Income), label="Income", color="green", marker='o', markersize=4)
+        ax1.plot(*sampling.thin(Expense.index, abs(Expense)), label="Expense", color="red", marker='o', markersize=4)
+        
+        ax1.set_title('Income and Expenses Over Time', pad=20, fontsize=12)
+        ax1.set_xlabel('Date', labelpad=10, fontsize=10)
+        ax1.set_ylabel('Amount', labelpad=10, fontsize=10)
+        ax1.legend(loc='upper left', bbox_to_anchor=(1.02, 1), fontsize=10)
+        ax1.grid(True, alpha=0.3)
+        
+        # Rotate x-axis labels for better readability
+        plt.setp(ax1.get_xticklabels(), rotation=45, ha='right')
+        
+        # Plot net savings
+        net_savings = Income + Expense  # Expense is already negative
+        ax2.plot(*sampling.thin(net_savings.index, net_savings), label="Net Savings", color="blue", marker='o', markersize=4)
+        ax2.set_title('Net Savings Over Time', pad=20, fontsize=12)
+        ax2.set_xlabel('Date', labelpad=10, fontsize=10)
+        ax2.set_ylabel('Amount', labelpad=10, fontsize=10)
+        ax2.legend(loc='upper left', bbox_to_anchor=(1.02, 1), fontsize=10)
+        ax2.grid(True, alpha=0.3)
+        
+        # Rotate x-axis labels for better readability
+        plt.setp(ax2.get_xticklabels(), rotation=45, ha='right')
+
     @classmethod
     def visualize_all_data(self):
         try:
-            # Read and prepare data
-            df = pd.read_csv(self.CSV_FILE)
-            df["Date"] = pd.to_datetime(df["Date"], format="%d-%m-%Y")
-            df = df.sort_values("Date")  # Sort by date
-            df.set_index("Date", inplace=True)
-            
-            # Create figure with two subplots
-            fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(16, 10), height_ratios=[3, 1], constrained_layout=True)
-            
-            # Calculate and plot data
-            Income = df[df["Amount"] > 0].resample("D").sum().reindex(df.index, fill_value=0)
-            Expense = df[df["Amount"] < 0].resample("D").sum().reindex(df.index, fill_value=0)
-            
-            # Plot income and expenses
-            ax1.plot(Income.index, Income["Amount"], label="Income", color="green", marker='o', markersize=4)
-            ax1.plot(Expense.index, abs(Expense["Amount"]), label="Expense", color="red", marker='o', markersize=4)
-            
-            ax1.set_title('Income and Expenses Over Time', pad=20, fontsize=12)
-            ax1.set_xlabel('Date', labelpad=10, fontsize=10)
-            ax1.set_ylabel('Amount', labelpad=10, fontsize=10)
-            ax1.legend(loc='upper left', bbox_to_anchor=(1.02, 1), fontsize=10)
-            ax1.grid(True, alpha=0.3)
-            
-            # Rotate x-axis labels for better readability
-            plt.setp(ax1.get_xticklabels(), rotation=45, ha='right')
-            
-            # Plot net savings
-            net_savings = Income["Amount"] + Expense["Amount"]  # Expense is already negative
-            ax2.plot(net_savings.index, net_savings, label="Net Savings", color="blue", marker='o', markersize=4)
-            ax2.set_title('Net Savings Over Time', pad=20, fontsize=12)
-            ax2.set_xlabel('Date', labelpad=10, fontsize=10)
-            ax2.set_ylabel('Amount', labelpad=10, fontsize=10)
-            ax2.legend(loc='upper left', bbox_to_anchor=(1.02, 1), fontsize=10)
-            ax2.grid(True, alpha=0.3)
-            
-            # Rotate x-axis labels for better readability
-            plt.setp(ax2.get_xticklabels(), rotation=45, ha='right')
-            
-            while True:
-                save = input("Do you want to save the plot?(y,n):").lower()
-                ans = ["y", "n"]
-                if save not in ans:
-                    continue
-                elif save == "y":
-                    if not os.path.exists('reports'):
-                        os.makedirs('reports')
-                    plt.savefig('reports/trends_over_time.png', bbox_inches='tight', dpi=300)
-                    print("Trend visualization saved to 'reports/trends_over_time.png'")
-                    break
-                elif save == "n":
-                    break
-                else:
-                    break
-            
-            plt.show()
-            plt.close()
+            # Every day from the shared daily series, quiet days at zero (in the base currency when one is set)
+            daily = self.daily_series()
+            self.plot_trends(daily)
+            self.finish('trends', (daily,), "Trend")
             
         except Exception as error:
             print(f"Error creating visualization: {error}")
 
+    @classmethod
+    def plot_monthly(self, monthly_data):
+        monthly_data = monthly_data.copy()
+        monthly_data['Month'] = monthly_data['Month'].dt.strftime('%B %Y')
+        
+        # Create figure with two subplots
+        fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(16, 10), height_ratios=[2, 1], constrained_layout=True)
+        
+        # Plot stacked bar chart
+        x = range(len(monthly_data))
+        width = 0.35
+        
+        ax1.bar(x, monthly_data['Income'], width, label='Income', color='green')
+        ax1.bar(x, monthly_data['Expenses'], width, 
+               bottom=monthly_data['Income'], label='Expenses', color='red')
+        
+        ax1.set_title('Monthly Income and Expenses', pad=20, fontsize=12)
+        ax1.set_xlabel('Month', labelpad=10, fontsize=10)
+        ax1.set_ylabel('Amount', labelpad=10, fontsize=10)
+        ax1.set_xticks(x)
+        ax1.set_xticklabels(monthly_data['Month'], rotation=45, ha='right')
+        ax1.legend(loc='upper left', bbox_to_anchor=(1.02, 1), fontsize=10)
+        ax1.grid(True, alpha=0.3)
+        
+        # Plot line chart of net savings
+        net_savings = monthly_data['Total']
+        ax2.plot(x, net_savings, marker='o', color='purple', label='Net Savings')
+        ax2.set_title('Monthly Net Savings', pad=20, fontsize=12)
+        ax2.set_xlabel('Month', labelpad=10, fontsize=10)
+        ax2.set_ylabel('Amount', labelpad=10, fontsize=10)
+        ax2.set_xticks(x)
+        ax2.set_xticklabels(monthly_data['Month'], rotation=45, ha='right')
+        ax2.grid(True, alpha=0.3)
+        ax2.legend(loc='upper left', bbox_to_anchor=(1.02, 1), fontsize=10)
+
     @classmethod
     def visualize_monthly_trends(self):
         try:
-            df = pd.read_csv(self.CSV_FILE)
-            df["Date"] = pd.to_datetime(df["Date"], format="%d-%m-%Y")
-            
-            # Create date into date-time object to get help in plot
-            df['Month'] = df['Date'].dt.strftime('%B %Y')
-            
-            # Calculate monthly totals
-            monthly_data = df.groupby('Month').agg({
-                'Amount': lambda x: {
-                    'Income': x[x > 0].sum(),
-                    'Expenses': abs(x[x < 0].sum()),
-                    'Total': x.sum()
-                }
-            }).reset_index()
-            
-            # Sort the data by date
-            monthly_data['Date'] = pd.to_datetime(monthly_data['Month'], format='%B %Y')
-            monthly_data = monthly_data.sort_values('Date')
-            monthly_data['Month'] = monthly_data['Date'].dt.strftime('%B %Y')
-            
-            # Create figure with two subplots
-            fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(16, 10), height_ratios=[2, 1], constrained_layout=True)
-            
-            # Plot stacked bar chart
-            x = range(len(monthly_data))
-            width = 0.35
-            
-            ax1.bar(x, monthly_data['Amount'].apply(lambda x: x['Income']), width, label='Income', color='green')
-            ax1.bar(x, monthly_data['Amount'].apply(lambda x: x['Expenses']), width, 
-                   bottom=monthly_data['Amount'].apply(lambda x: x['Income']), label='Expenses', color='red')
-            
-            ax1.set_title('Monthly Income and Expenses', pad=20, fontsize=12)
-            ax1.set_xlabel('Month', labelpad=10, fontsize=10)
-            ax1.set_ylabel('Amount', labelpad=10, fontsize=10)
-            ax1.set_xticks(x)
-            ax1.set_xticklabels(monthly_data['Month'], rotation=45, ha='right')
-            ax1.legend(loc='upper left', bbox_to_anchor=(1.02, 1), fontsize=10)
-            ax1.grid(True, alpha=0.3)
-            
-            # Plot line chart of net savings
-            net_savings = monthly_data['Amount'].apply(lambda x: x['Total'])
-            ax2.plot(x, net_savings, marker='o', color='purple', label='Net Savings')
-            ax2.set_title('Monthly Net Savings', pad=20, fontsize=12)
-            ax2.set_xlabel('Month', labelpad=10, fontsize=10)
-            ax2.set_ylabel('Amount', labelpad=10, fontsize=10)
-            ax2.set_xticks(x)
-            ax2.set_xticklabels(monthly_data['Month'], rotation=45, ha='right')
-            ax2.grid(True, alpha=0.3)
-            ax2.legend(loc='upper left', bbox_to_anchor=(1.02, 1), fontsize=10)
-            
-            while True:
-                save = input("Do you want to save the plot?(y,n):").lower()
-                ans = ["y", "n"]
-                if save not in ans:
-                    continue
-                elif save == "y":
-                    if not os.path.exists('reports'):
-                        os.makedirs('reports')
-                    plt.savefig('reports/monthly_trends.png', bbox_inches='tight', dpi=300)
-                    print("Monthly trends visualization saved to 'reports/monthly_trends.png'")
-                    break
-                elif save == "n":
-                    break
-                else:
-                    break
-            
-            plt.show()
-            plt.close()
+            # Calculate monthly totals, already in date order
+            monthly_data = self.monthly_totals()
+            self.plot_monthly(monthly_data)
+            self.finish('monthly', (monthly_data,), "Monthly trends")
             
         except Exception as error:
             print(f"Error creating visualization: {error}")
 
+    @classmethod
+    def plot_currency(self, currency_counts):
+        # Create pie chart
+        plt.figure(figsize=(12, 8), constrained_layout=True)
+        plt.pie(currency_counts, labels=currency_counts.index, autopct='%1.1f%%', 
+               textprops={'fontsize': 10})
+        plt.title('Distribution of Transactions by Currency', pad=20, fontsize=12)
+        
+        # Add legend outside the pie chart
+        plt.legend(currency_counts.index, title="Currencies",
+                  loc="center left", bbox_to_anchor=(1, 0, 0.5, 1),
+                  fontsize=10)
+
     @classmethod
     def visualize_currency_distribution(self):
         try:
-            df = pd.read_csv(self.CSV_FILE)
-            
-            # Count transactions by currency and sort by count
-            currency_counts = df['Currency'].value_counts().sort_values(ascending=False)
-            
-            # Create pie chart
-            plt.figure(figsize=(12, 8), constrained_layout=True)
-            plt.pie(currency_counts, labels=currency_counts.index, autopct='%1.1f%%', 
-                   textprops={'fontsize': 10})
-            plt.title('Distribution of Transactions by Currency', pad=20, fontsize=12)
-            
-            # Add legend outside the pie chart
-            plt.legend(currency_counts.index, title="Currencies",
-                      loc="center left", bbox_to_anchor=(1, 0, 0.5, 1),
-                      fontsize=10)
-            
-            while True:
-                save = input("Do you want to save the plot?(y,n):").lower()
-                ans = ["y", "n"]
-                if save not in ans:
-                    continue
-                elif save == "y":
-                    if not os.path.exists('reports'):
-                        os.makedirs('reports')
-                    plt.savefig('reports/currency_distribution.png', bbox_inches='tight', dpi=300)
-                    print("Currency distribution visualization saved to 'reports/currency_distribution.png'")
-                    break
-                elif save == "n":
-                    break
-                else:
-                    break
-            
-            plt.show()
-            plt.close()
+            # Count transactions by currency, read off the rollups instead of the ledger
+            currency_counts = self.transaction_counts()['Currency']
+            self.plot_currency(currency_counts)
+            self.finish('currency', (currency_counts,), "Currency distribution")
             
         except Exception as error:
             print(f"Error creating currency distribution visualization: {error}")
 
+    @classmethod
+    def plot_ratio(self, totals):
+        total_income = totals['Income']
+        total_expenses = totals['Expenses']
+        
+        # Create pie chart
+        plt.figure(figsize=(12, 8), constrained_layout=True)
+        plt.pie([total_income, total_expenses], 
+               labels=['Income', 'Expenses'],
+               autopct='%1.1f%%',
+               colors=['green', 'red'],
+               textprops={'fontsize': 10})
+        plt.title('Income vs Expenses Distribution', pad=20, fontsize=12)
+        
+        # Add legend outside the pie chart
+        plt.legend(['Income', 'Expenses'], title="Categories",
+                  loc="center left", bbox_to_anchor=(1, 0, 0.5, 1),
+                  fontsize=10)
+
     @classmethod
     def visualize_income_expense_ratio(self):
         try:
-            df = pd.read_csv(self.CSV_FILE)
-            
             # Calculate total income and expenses
-            total_income = df[df['Amount'] > 0]['Amount'].sum()
-            total_expenses = abs(df[df['Amount'] < 0]['Amount'].sum())
-            
-            # Create pie chart
-            plt.figure(figsize=(12, 8), constrained_layout=True)
-            plt.pie([total_income, total_expenses], 
-                   labels=['Income', 'Expenses'],
-                   autopct='%1.1f%%',
-                   colors=['green', 'red'],
-                   textprops={'fontsize': 10})
-            plt.title('Income vs Expenses Distribution', pad=20, fontsize=12)
-            
-            # Add legend outside the pie chart
-            plt.legend(['Income', 'Expenses'], title="Categories",
-                      loc="center left", bbox_to_anchor=(1, 0, 0.5, 1),
-                      fontsize=10)
-            
-            while True:
-                save = input("Do you want to save the plot?(y,n):").lower()
-                ans = ["y", "n"]
-                if save not in ans:
-                    continue
-                elif save == "y":
-                    if not os.path.exists('reports'):
-                        os.makedirs('reports')
-                    plt.savefig('reports/income_expense_ratio.png', bbox_inches='tight', dpi=300)
-                    print("Income vs Expenses ratio visualization saved to 'reports/income_expense_ratio.png'")
-                    break
-                elif save == "n":
-                    break
-                else:
-                    break
-            
-            plt.show()
-            plt.close()
+            totals = self.totals()
+            self.plot_ratio(totals)
+            self.finish('ratio', (totals,), "Income vs Expenses ratio")
             
         except Exception as error:
             print(f"Error creating income vs expenses ratio visualization: {error}")
 
+    @classmethod
+    def plot_use_cases(self, use_counts):
+        # If there are too many use cases, combine the smaller ones into "Others"
+        if len(use_counts) > 10:
+            # Keep top 9 use cases and combine the rest
+            top_uses = use_counts.head(9)
+            other_uses = use_counts[9:].sum()
+            use_counts = pd.concat([top_uses, pd.Series({'Others': other_uses})])
+        
+        # Create pie chart
+        plt.figure(figsize=(14, 10), constrained_layout=True)
+        colors = plt.cm.Pastel1(np.linspace(0, 1, len(use_counts)))
+        plt.pie(use_counts, 
+               labels=use_counts.index,
+               autopct='%1.1f%%',
+               colors=colors,
+               startangle=90,
+               textprops={'fontsize': 10})
+        plt.title('Distribution of Transactions by Use Case', pad=20, fontsize=12)
+        
+        # Add legend outside the pie chart
+        plt.legend(use_counts.index,
+                  title="Use Cases",
+                  loc="center left",
+                  bbox_to_anchor=(1, 0, 0.5, 1),
+                  fontsize=10)
+
     @classmethod
     def visualize_use_cases(self):
         try:
-            df = pd.read_csv(self.CSV_FILE)
-            
-            # Count transactions by use case and sort by count
-            use_counts = df['Use'].value_counts().sort_values(ascending=False)
-            
-            # If there are too many use cases, combine the smaller ones into "Others"
-            if len(use_counts) > 10:
-                # Keep top 9 use cases and combine the rest
-                top_uses = use_counts.head(9)
-                other_uses = use_counts[9:].sum()
-                use_counts = pd.concat([top_uses, pd.Series({'Others': other_uses})])
-            
-            # Create pie chart
-            plt.figure(figsize=(14, 10), constrained_layout=True)
-            colors = plt.cm.Pastel1(np.linspace(0, 1, len(use_counts)))
-            plt.pie(use_counts, 
-                   labels=use_counts.index,
-                   autopct='%1.1f%%',
-                   colors=colors,
-                   startangle=90,
-                   textprops={'fontsize': 10})
-            plt.title('Distribution of Transactions by Use Case', pad=20, fontsize=12)
-            
-            # Add legend outside the pie chart
-            plt.legend(use_counts.index,
-                      title="Use Cases",
-                      loc="center left",
-                      bbox_to_anchor=(1, 0, 0.5, 1),
-                      fontsize=10)
-            
-            while True:
-                save = input("Do you want to save the plot?(y,n):").lower()
-                ans = ["y", "n"]
-                if save not in ans:
-                    continue
-                elif save == "y":
-                    if not os.path.exists('reports'):
-                        os.makedirs('reports')
-                    plt.savefig('reports/use_cases_distribution.png', bbox_inches='tight', dpi=300)
-                    print("Use cases distribution visualization saved to 'reports/use_cases_distribution.png'")
-                    break
-                elif save == "n":
-                    break
-                else:
-                    break
-            
-            plt.show()
-            plt.close()
+            # Count transactions by use case, read off the rollups instead of the ledger
+            use_counts = self.transaction_counts()['Use']
+            self.plot_use_cases(use_counts)
+            self.finish('use-cases', (use_counts,), "Use cases distribution")
             
         except Exception as error:
             print(f"Error creating use cases visualization: {error}")
 
+    @classmethod
+    def plot_use_cases_by_type(self, counts):
+        # Create separate pie charts for income and expenses
+        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 7))
+        
+        # Income use cases - sort by count
+        income_uses = counts['IncomeUse'].sort_values(ascending=False)
+        income_uses = income_uses[income_uses > 0]
+        if len(income_uses) > 5:
+            top_income = income_uses.head(4)
+            other_income = income_uses[4:].sum()
+            income_uses = pd.concat([top_income, pd.Series({'Others': other_income})])
+        
+        # Expense use cases - sort by count
+        expense_uses = counts['ExpenseUse'].sort_values(ascending=False)
+        expense_uses = expense_uses[expense_uses > 0]
+        if len(expense_uses) > 5:
+            top_expense = expense_uses.head(4)
+            other_expense = expense_uses[4:].sum()
+            expense_uses = pd.concat([top_expense, pd.Series({'Others': other_expense})])
+        
+        # Plot income use cases
+        colors1 = plt.cm.Greens(np.linspace(0.3, 0.8, len(income_uses)))
+        ax1.pie(income_uses, 
+               labels=income_uses.index,
+               autopct='%1.1f%%',
+               colors=colors1,
+               startangle=90)
+        ax1.set_title('Income Use Cases')
+        
+        # Plot expense use cases
+        colors2 = plt.cm.Reds(np.linspace(0.3, 0.8, len(expense_uses)))
+        ax2.pie(expense_uses, 
+               labels=expense_uses.index,
+               autopct='%1.1f%%',
+               colors=colors2,
+               startangle=90)
+        ax2.set_title('Expense Use Cases')
+        
+        plt.suptitle('Distribution of Use Cases by Transaction Type', y=1.05)
+        plt.tight_layout()
+
     @classmethod
     def visualize_use_cases_by_type(self):
         try:
-            df = pd.read_csv(self.CSV_FILE)
-            
-            # Create separate pie charts for income and expenses
-            fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 7))
-            
-            # Income use cases - sort by count
-            income_uses = df[df['Amount'] > 0]['Use'].value_counts().sort_values(ascending=False)
-            if len(income_uses) > 5:
-                top_income = income_uses.head(4)
-                other_income = income_uses[4:].sum()
-                income_uses = pd.concat([top_income, pd.Series({'Others': other_income})])
-            
-            # Expense use cases - sort by count
-            expense_uses = df[df['Amount'] < 0]['Use'].value_counts().sort_values(ascending=False)
-            if len(expense_uses) > 5:
-                top_expense = expense_uses.head(4)
-                other_expense = expense_uses[4:].sum()
-                expense_uses = pd.concat([top_expense, pd.Series({'Others': other_expense})])
-            
-            # Plot income use cases
-            colors1 = plt.cm.Greens(np.linspace(0.3, 0.8, len(income_uses)))
-            ax1.pie(income_uses, 
-                   labels=income_uses.index,
-                   autopct='%1.1f%%',
-                   colors=colors1,
-                   startangle=90)
-            ax1.set_title('Income Use Cases')
-            
-            # Plot expense use cases
-            colors2 = plt.cm.Reds(np.linspace(0.3, 0.8, len(expense_uses)))
-            ax2.pie(expense_uses, 
-                   labels=expense_uses.index,
-                   autopct='%1.1f%%',
-                   colors=colors2,
-                   startangle=90)
-            ax2.set_title('Expense Use Cases')
-            
-            plt.suptitle('Distribution of Use Cases by Transaction Type', y=1.05)
-            plt.tight_layout()
-            
-            while True:
-                save = input("Do you want to save the plot?(y,n):").lower()
-                ans = ["y", "n"]
-                if save not in ans:
-                    continue
-                elif save == "y":
-                    if not os.path.exists('reports'):
-                        os.makedirs('reports')
-                    plt.savefig('reports/use_cases_by_type.png', 
-                              bbox_inches='tight', 
-                              dpi=300)
-                    print("Use cases by type visualization saved to 'reports/use_cases_by_type.png'")
-                    break
-                elif save == "n":
-                    break
-                else:
-                    break
-            
-            plt.show()
-            plt.close()
+            # Transactions per use case for each type, read off the rollups instead of the ledger
+            counts = self.transaction_counts()
+            self.plot_use_cases_by_type(counts)
+            self.finish('use-cases-by-type', (counts,), "Use cases by type")
             
         except Exception as error:
             print(f"Error creating use cases by type visualization: {error}")
 
+    @classmethod
+    def plot_predictions(self, predictions, r2_scores):
+        # Create figure with three subplots
+        fig, (ax1, ax2, ax3) = plt.subplots(3, 1, figsize=(16, 15), height_ratios=[1, 1, 1], constrained_layout=True)
+        
+        # Plot income predictions
+        ax1.plot(predictions['Dates'], predictions['Income'], 'g-', label='Predicted Income')
+        ax1.set_title('Predicted Income Over Time', pad=20, fontsize=12)
+        ax1.set_xlabel('Date', labelpad=10, fontsize=10)
+        ax1.set_ylabel('Amount', labelpad=10, fontsize=10)
+        ax1.grid(True, alpha=0.3)
+        ax1.legend(loc='upper left', bbox_to_anchor=(1.02, 1), fontsize=10)
+        
+        # Rotate x-axis labels for better readability
+        plt.setp(ax1.get_xticklabels(), rotation=45, ha='right')
+        
+        # Plot expense predictions
+        ax2.plot(predictions['Dates'], predictions['Expenses'], 'r-', label='Predicted Expenses')
+        ax2.set_title('Predicted Expenses Over Time', pad=20, fontsize=12)
+        ax2.set_xlabel('Date', labelpad=10, fontsize=10)
+        ax2.set_ylabel('Amount', labelpad=10, fontsize=10)
+        ax2.grid(True, alpha=0.3)
+        ax2.legend(loc='upper left', bbox_to_anchor=(1.02, 1), fontsize=10)
+        
+        # Rotate x-axis labels for better readability
+        plt.setp(ax2.get_xticklabels(), rotation=45, ha='right')
+        
+        # Plot net predictions
+        ax3.plot(predictions['Dates'], predictions['Net'], 'b-', label='Predicted Net')
+        ax3.set_title('Predicted Net Savings Over Time', pad=20, fontsize=12)
+        ax3.set_xlabel('Date', labelpad=10, fontsize=10)
+        ax3.set_ylabel('Amount', labelpad=10, fontsize=10)
+        ax3.grid(True, alpha=0.3)
+        ax3.legend(loc='upper left', bbox_to_anchor=(1.02, 1), fontsize=10)
+        
+        # Rotate x-axis labels for better readability
+        plt.setp(ax3.get_xticklabels(), rotation=45, ha='right')
+        
+        # Add R² scores to the plot
+        plt.figtext(0.02, 0.02, 
+                   f"Model Accuracy (R² scores):\n"
+                   f"Income: {r2_scores['Income']:.3f}\n"
+                   f"Expenses: {r2_scores['Expenses']:.3f}\n"
+                   f"Net: {r2_scores['Net']:.3f}",
+                   fontsize=10, bbox=dict(facecolor='white', alpha=0.8))
+
     @classmethod
     def visualize_predictions(self, predictions, r2_scores):
         try:
             if predictions is None:
                 return
 
-            # Create figure with three subplots
-            fig, (ax1, ax2, ax3) = plt.subplots(3, 1, figsize=(16, 15), height_ratios=[1, 1, 1], constrained_layout=True)
-            
-            # Plot income predictions
-            ax1.plot(predictions['Dates'], predictions['Income'], 'g-', label='Predicted Income')
-            ax1.set_title('Predicted Income Over Time', pad=20, fontsize=12)
-            ax1.set_xlabel('Date', labelpad=10, fontsize=10)
-            ax1.set_ylabel('Amount', labelpad=10, fontsize=10)
-            ax1.grid(True, alpha=0.3)
-            ax1.legend(loc='upper left', bbox_to_anchor=(1.02, 1), fontsize=10)
-            
-            # Rotate x-axis labels for better readability
-            plt.setp(ax1.get_xticklabels(), rotation=45, ha='right')
-            
-            # Plot expense predictions
-            ax2.plot(predictions['Dates'], predictions['Expenses'], 'r-', label='Predicted Expenses')
-            ax2.set_title('Predicted Expenses Over Time', pad=20, fontsize=12)
-            ax2.set_xlabel('Date', labelpad=10, fontsize=10)
-            ax2.set_ylabel('Amount', labelpad=10, fontsize=10)
-            ax2.grid(True, alpha=0.3)
-            ax2.legend(loc='upper left', bbox_to_anchor=(1.02, 1), fontsize=10)
-            
-            # Rotate x-axis labels for better readability
-            plt.setp(ax2.get_xticklabels(), rotation=45, ha='right')
-            
-            # Plot net predictions
-            ax3.plot(predictions['Dates'], predictions['Net'], 'b-', label='Predicted Net')
-            ax3.set_title('Predicted Net Savings Over Time', pad=20, fontsize=12)
-            ax3.set_xlabel('Date', labelpad=10, fontsize=10)
-            ax3.set_ylabel('Amount', labelpad=10, fontsize=10)
-            ax3.grid(True, alpha=0.3)
-            ax3.legend(loc='upper left', bbox_to_anchor=(1.02, 1), fontsize=10)
-            
-            # Rotate x-axis labels for better readability
-            plt.setp(ax3.get_xticklabels(), rotation=45, ha='right')
-            
-            # Add R² scores to the plot
-            plt.figtext(0.02, 0.02, 
-                       f"Model Accuracy (R² scores):\n"
-                       f"Income: {r2_scores['Income']:.3f}\n"
-                       f"Expenses: {r2_scores['Expenses']:.3f}\n"
-                       f"Net: {r2_scores['Net']:.3f}",
-                       fontsize=10, bbox=dict(facecolor='white', alpha=0.8))
-            
-            while True:
-                save = input("Do you want to save the prediction plots?(y,n):").lower()
-                ans = ["y", "n"]
-                if save not in ans:
-                    continue
-                elif save == "y":
-                    if not os.path.exists('reports'):
-                        os.makedirs('reports')
-                    plt.savefig('reports/future_predictions.png', bbox_inches='tight', dpi=300)
-                    print("Prediction visualization saved to 'reports/future_predictions.png'")
-                    break
-                elif save == "n":
-                    break
-                else:
-                    break
-            
-            plt.show()
-            plt.close()
+            self.plot_predictions(predictions, r2_scores)
+            self.finish('predictions', (predictions, r2_scores), "Prediction", question="Do you want to save the prediction plots?(y,n):")
             
         except Exception as error:
             print(f"Error creating prediction visualization: {error}")
 
+    @classmethod
+    def plot_comparison(self, comparison, error_metrics):
+        # Create figure with three subplots
+        fig, (ax1, ax2, ax3) = plt.subplots(3, 1, figsize=(16, 15), height_ratios=[1, 1, 1], constrained_layout=True)
+        
+        # Backtest error against the number of days ahead a forecast was made, one subplot per series
+        for ax, metric, color, title in ((ax1, 'Income', 'g', 'Income'), (ax2, 'Expenses', 'r', 'Expenses'), (ax3, 'Net', 'b', 'Net Savings')):
+            ax.plot(*sampling.thin(comparison['Horizon'], comparison[f'MAE_{metric}']), f'{color}-', label=f'{metric} MAE')
+            ax.plot(*sampling.thin(comparison['Horizon'], comparison[f'RMSE_{metric}']), f'{color}--', label=f'{metric} RMSE')
+            ax.set_title(f'{title}: Forecast Error by Days Ahead', pad=20, fontsize=12)
+            ax.set_xlabel('Days Ahead', labelpad=10, fontsize=10)
+            ax.set_ylabel('Error', labelpad=10, fontsize=10)
+            ax.grid(True, alpha=0.3)
+            ax.legend(loc='upper left', bbox_to_anchor=(1.02, 1), fontsize=10)
+        
+        # Add error metrics to the plot
+        plt.figtext(0.02, 0.02, 
+                   f"Walk-forward backtest, {comparison['Folds']} forecasts from "
+                   f"{comparison['From'].strftime('%d-%m-%Y')} to {comparison['To'].strftime('%d-%m-%Y')}\n"
+                   f"Income - MAE: {error_metrics['Income']['MAE']:.2f}, RMSE: {error_metrics['Income']['RMSE']:.2f}\n"
+                   f"Expenses - MAE: {error_metrics['Expenses']['MAE']:.2f}, RMSE: {error_metrics['Expenses']['RMSE']:.2f}\n"
+                   f"Net - MAE: {error_metrics['Net']['MAE']:.2f}, RMSE: {error_metrics['Net']['RMSE']:.2f}",
+                   fontsize=10, bbox=dict(facecolor='white', alpha=0.8))
+
     @classmethod
     def visualize_prediction_comparison(self, comparison, error_metrics):
         try:
             if comparison is None:
                 return
 
-            # Create figure with three subplots
-            fig, (ax1, ax2, ax3) = plt.subplots(3, 1, figsize=(16, 15), height_ratios=[1, 1, 1], constrained_layout=True)
-            
-            # Plot income comparison
-            ax1.plot(comparison['Dates'], comparison['Predicted_Income'], 'g-', label='Predicted Income')
-            ax1.plot(comparison['Dates'], comparison['Actual_Income'], 'g--', label='Actual Income')
-            ax1.set_title('Income: Predicted vs Actual', pad=20, fontsize=12)
-            ax1.set_xlabel('Date', labelpad=10, fontsize=10)
-            ax1.set_ylabel('Amount', labelpad=10, fontsize=10)
-            ax1.grid(True, alpha=0.3)
-            ax1.legend(loc='upper left', bbox_to_anchor=(1.02, 1), fontsize=10)
-            
-            # Rotate x-axis labels for better readability
-            plt.setp(ax1.get_xticklabels(), rotation=45, ha='right')
-            
-            # Plot expense comparison
-            ax2.plot(comparison['Dates'], comparison['Predicted_Expenses'], 'r-', label='Predicted Expenses')
-            ax2.plot(comparison['Dates'], comparison['Actual_Expenses'], 'r--', label='Actual Expenses')
-            ax2.set_title('Expenses: Predicted vs Actual', pad=20, fontsize=12)
-            ax2.set_xlabel('Date', labelpad=10, fontsize=10)
-            ax2.set_ylabel('Amount', labelpad=10, fontsize=10)
-            ax2.grid(True, alpha=0.3)
-            ax2.legend(loc='upper left', bbox_to_anchor=(1.02, 1), fontsize=10)
-            
-            # Rotate x-axis labels for better readability
-            plt.setp(ax2.get_xticklabels(), rotation=45, ha='right')
-            
-            # Plot net comparison
-            ax3.plot(comparison['Dates'], comparison['Predicted_Net'], 'b-', label='Predicted Net')
-            ax3.plot(comparison['Dates'], comparison['Actual_Net'], 'b--', label='Actual Net')
-            ax3.set_title('Net Savings: Predicted vs Actual', pad=20, fontsize=12)
-            ax3.set_xlabel('Date', labelpad=10, fontsize=10)
-            ax3.set_ylabel('Amount', labelpad=10, fontsize=10)
-            ax3.grid(True, alpha=0.3)
-            ax3.legend(loc='upper left', bbox_to_anchor=(1.02, 1), fontsize=10)
-            
-            # Rotate x-axis labels for better readability
-            plt.setp(ax3.get_xticklabels(), rotation=45, ha='right')
-            
-            # Add error metrics to the plot
-            plt.figtext(0.02, 0.02, 
-                       f"Error Metrics:\n"
-                       f"Income - MAE: {error_metrics['Income']['MAE']:.2f}, RMSE: {error_metrics['Income']['RMSE']:.2f}\n"
-                       f"Expenses - MAE: {error_metrics['Expenses']['MAE']:.2f}, RMSE: {error_metrics['Expenses']['RMSE']:.2f}\n"
-                       f"Net - MAE: {error_metrics['Net']['MAE']:.2f}, RMSE: {error_metrics['Net']['RMSE']:.2f}",
-                       fontsize=10, bbox=dict(facecolor='white', alpha=0.8))
-            
-            while True:
-                save = input("Do you want to save the comparison plots?(y,n):").lower()
-                ans = ["y", "n"]
-                if save not in ans:
-                    continue
-                elif save == "y":
-                    if not os.path.exists('reports'):
-                        os.makedirs('reports')
-                    plt.savefig('reports/prediction_comparison.png', bbox_inches='tight', dpi=300)
-                    print("Comparison visualization saved to 'reports/prediction_comparison.png'")
-                    break
-                elif save == "n":
-                    break
-                else:
-                    break
-            
-            plt.show()
-            plt.close()
+            self.plot_comparison(comparison, error_metrics)
+            self.finish('comparison', (comparison, error_metrics), "Comparison", question="Do you want to save the comparison plots?(y,n):")
             
         except Exception as error:
             print(f"Error creating prediction comparison visualization: {error}")
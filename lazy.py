@@ -0,0 +1,17 @@
+import importlib
+
+class lazy_module: # Stands in for a heavy module (or one name in it) and imports it the first time it is used.
+    def __init__(self, module, name=None):
+        self._module = module
+        self._name = name
+        self._target = None
+
+    def _load(self):
+        if self._target is None:
+            target = importlib.import_module(self._module)
+            self._target = getattr(target, self._name) if self._name else target
+        return self._target
+
+    def __getattr__(self, attr):
+        # only reached for attributes the proxy itself does not have
+        return getattr(self._load(), attr)
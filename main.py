@@ -1,14 +1,22 @@
 from core import * # wildcard import all the functions from the core module
 from datetime import datetime
-from functions import * 
-from Filter_data import *
-from graphing import *
-from predictions import *
-import matplotlib.pyplot as plt
-from logs import *
+from lazy import lazy_module
 from users import *
 import os
 import csv
+import argparse
+import json
+import sys
+
+# Everything heavier than core is imported on first use, so the menu and the batch commands start quickly.
+# graphing pulls in matplotlib and predictions fits its models, only the actions that need them pay for them.
+functions = lazy_module('functions')
+filter = lazy_module('Filter_data', 'filter')
+graphing = lazy_module('graphing', 'graphing')
+predictions = lazy_module('predictions', 'predictions')
+log = lazy_module('logs', 'log')
+plt = lazy_module('matplotlib.pyplot')
+pd = lazy_module('pandas')
 
 today = datetime.today()
 
@@ -27,6 +35,7 @@ def display_menu():
     print("7. Filter by Type (Income/Expense)")
     print("8. View Monthly Summary")
     print("9. View Overall Summary")
+    print("20. View Largest Expenses")
     print("\n=== Visualization Options ===")
     print("10. View Income/Expense Trends")
     print("11. View Monthly Trends")
@@ -34,11 +43,13 @@ def display_menu():
     print("13. View Income vs Expenses Ratio")
     print("14. View Use Cases Distribution")
     print("15. View Use Cases by Type (Income/Expenses)")
+    print("21. Save All Reports (no prompts)")
     print("\n=== Prediction Options ===")
     print("16. View Future Predictions")
     print("17. View Prediction Summary")
     print("18. Compare Predictions with Actual Data")
     print("19. View Prediction Comparison Summary")
+    print("22. View Predictions by Use")
     print("\n=== Exit ===")
     print("0. Exit Program")
 
@@ -66,33 +77,218 @@ def get_date_range():
         except ValueError:
             print("Invalid date format. Please use DD-MM-YYYY format.")
 
+def write_record(record, fmt): # one result row without going through pandas
+    if fmt == "json":
+        sys.stdout.write(json.dumps([record]) + "\n")
+    else:
+        writer = csv.DictWriter(sys.stdout, fieldnames=list(record), lineterminator="\n")
+        writer.writeheader()
+        writer.writerow(record)
+
+def write_table(df, fmt): # machine-readable output for the batch commands
+    if fmt == "json":
+        sys.stdout.write(df.to_json(orient="records", date_format="iso") + "\n")
+    else:
+        df.to_csv(sys.stdout, index=False)
+
+def transactions_table(df): # typed rows back into plain values, Id is the row id delete/edit use
+    return pd.DataFrame({
+        'Id': df.index,
+        'Date': df['Date'].dt.strftime('%d-%m-%Y'),
+        'Amount': csv_file.major(df['Amount']),
+        'Currency': df['Currency'].astype(object),
+        'Use': df['Use'].astype(object),
+        'Comment': df['Comment'].astype(object)
+    })
+
+def parse_date(value): # any supported input format -> Timestamp
+    return pd.Timestamp(datetime.strptime(csv_file.standardize_date(value), "%d-%m-%Y"))
+
+PLOTS = ['trends', 'monthly', 'currency', 'ratio', 'use-cases', 'use-cases-by-type', 'predictions', 'comparison'] # graphing.CHARTS names
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="main.py", description="Run one operation and exit. Without a command the interactive menu starts.")
+    parser.add_argument("--format", choices=["csv", "json"], default="csv", help="output format (default: csv)")
+    commands = parser.add_subparsers(dest="command")
+
+    add = commands.add_parser("add", help="add one transaction")
+    add.add_argument("--date", default=today.strftime("%d-%m-%Y"), help="transaction date (default: today)")
+    add.add_argument("--amount", type=float, required=True, help="amount, negative for expenses")
+    add.add_argument("--type", choices=["income", "expense"], help="sets the sign of the amount")
+    add.add_argument("--currency", default="PKR")
+    add.add_argument("--use", required=True, help="use/origin of the amount")
+    add.add_argument("--comment", default="No comment")
+
+    load = commands.add_parser("import", help="append transactions from a CSV with Date, Amount, Currency, Use, Comment columns")
+    load.add_argument("file")
+
+    filtering = commands.add_parser("filter", help="list transactions matching every given filter")
+    filtering.add_argument("--from", dest="start", help="first date")
+    filtering.add_argument("--to", dest="end", help="last date")
+    filtering.add_argument("--min", dest="min_amount", type=float, help="smallest amount")
+    filtering.add_argument("--max", dest="max_amount", type=float, help="largest amount")
+    filtering.add_argument("--type", dest="kind", choices=["income", "expense"])
+
+    commands.add_parser("summary", help="overall income, expenses and net")
+    commands.add_parser("monthly", help="income, expenses and net per month")
+
+    plot = commands.add_parser("plot", help="save one chart without showing it")
+    plot.add_argument("name", choices=list(PLOTS))
+    plot.add_argument("--out", help="image file (default: reports/NAME.png)")
+    plot.add_argument("--days", type=int, default=30, help="days for the predictions and comparison charts")
+
+    report = commands.add_parser("report", help="save every chart to a folder, rendered in parallel")
+    report.add_argument("--out-dir", default="reports")
+    report.add_argument("--days", type=int, default=30, help="days for the predictions and comparison charts")
+    report.add_argument("--workers", type=int, help="worker processes (default: one per chart, up to the CPU count)")
+
+    predict = commands.add_parser("predict", help="predicted daily income, expenses and net")
+    predict.add_argument("--days", type=int, default=30)
+    predict.add_argument("--by-use", action="store_true", help="one forecast per use, adding up to the overall one")
+    predict.add_argument("--by-currency", action="store_true", help="with --by-use, also split each use by currency")
+
+    backtest = commands.add_parser("backtest", help="walk-forward forecast error for each number of days ahead")
+    backtest.add_argument("--days", type=int, default=30, help="how many days ahead each forecast reaches")
+    backtest.add_argument("--step", type=int, default=1, help="make a forecast on every STEP-th transaction day")
+    return parser
+
+def run_command(argv): # batch mode: one operation, machine-readable output, exit status 0 on success
+    args = build_parser().parse_args(argv)
+    try:
+        csv_file.get_csv(load=False)
+        if args.command == "add":
+            amount = args.amount
+            if args.type == "expense":
+                amount = -abs(amount)
+            elif args.type == "income":
+                amount = abs(amount)
+            if amount == 0:
+                raise ValueError("Amount cannot be zero.")
+            added = csv_file.add_many([{
+                'Date': csv_file.standardize_date(args.date),
+                'Amount': amount,
+                'Currency': args.currency,
+                'Use': args.use,
+                'Comment': args.comment
+            }])
+            write_record({'Added': added}, args.format)
+
+        elif args.command == "import":
+            rows = pd.read_csv(args.file, usecols=csv_file.Columns)
+            rows['Comment'] = rows['Comment'].fillna("No comment")
+            added = csv_file.add_many(rows.to_dict('records'))
+            write_record({'Added': added}, args.format)
+
+        elif args.command == "filter":
+            rows = csv_file.query(
+                min_amount=args.min_amount, max_amount=args.max_amount,
+                start=parse_date(args.start) if args.start else None,
+                end=parse_date(args.end) if args.end else None,
+                kind=args.kind)
+            write_table(transactions_table(rows), args.format)
+
+        elif args.command == "summary":
+            write_record(csv_file.totals(), args.format)
+
+        elif args.command == "monthly":
+            if len(csv_file.rollup('month').index.get_level_values('Currency').unique()) > 1:
+                # amounts in different currencies are not added up: one row per month and currency, as in expenses_by_month
+                monthly = csv_file.monthly_by_currency().stack(level=0)[['Income', 'Expenses', 'Net']]
+                monthly = monthly[(monthly['Income'] != 0) | (monthly['Expenses'] != 0)].reset_index() # months a currency was not used
+            else:
+                monthly = csv_file.monthly_totals()
+            monthly['Month'] = monthly['Month'].dt.strftime('%m-%Y')
+            write_table(monthly, args.format)
+
+        elif args.command == "plot":
+            plt.switch_backend("Agg") # no window
+            out = args.out or f"reports/{args.name}.png"
+            data = graphing.chart_data(args.name, args.days)
+            if data is None:
+                raise RuntimeError(f"No data for the {args.name} chart.")
+            out, hit = graphing.save_chart(args.name, data, out)
+            write_record({'Plot': args.name, 'File': out, 'Cache': 'hit' if hit else 'miss'}, args.format)
+
+        elif args.command == "report":
+            plt.switch_backend("Agg") # no window
+            saved = graphing.render_all(args.out_dir, args.days, args.workers)
+            write_table(pd.DataFrame([{'Plot': name, **result} for name, result in saved.items()]), args.format)
+
+        elif args.command == "predict" and (args.by_use or args.by_currency):
+            forecast, r2_scores = predictions.predict_by_category(args.days, args.by_currency)
+            forecast['Date'] = forecast['Date'].dt.strftime('%d-%m-%Y')
+            if args.format == "json":
+                r2_scores = r2_scores.reset_index()
+                sys.stdout.write(json.dumps({'Predictions': json.loads(forecast.to_json(orient="records")),
+                                             'R2': json.loads(r2_scores.to_json(orient="records"))}) + "\n")
+            else:
+                write_table(forecast, args.format)
+
+        elif args.command == "predict":
+            result = predictions.predict_future(args.days)
+            if result is None:
+                raise RuntimeError("Could not make predictions.")
+            forecast, r2_scores = result
+            forecast = pd.DataFrame({
+                'Date': [date.strftime('%d-%m-%Y') for date in forecast['Dates']],
+                'Income': forecast['Income'],
+                'Expenses': forecast['Expenses'],
+                'Net': forecast['Net']
+            })
+            if args.format == "json":
+                sys.stdout.write(json.dumps({'Predictions': json.loads(forecast.to_json(orient="records")), 'R2': r2_scores}) + "\n")
+            else:
+                write_table(forecast, args.format)
+
+        elif args.command == "backtest":
+            comparison, error_metrics = predictions.backtest(args.days, args.step)
+            errors = pd.DataFrame({'Days': comparison['Horizon']})
+            for metric in ['Income', 'Expenses', 'Net']:
+                errors[f'{metric}MAE'] = comparison[f'MAE_{metric}']
+                errors[f'{metric}RMSE'] = comparison[f'RMSE_{metric}']
+            if args.format == "json":
+                sys.stdout.write(json.dumps({
+                    'Folds': comparison['Folds'],
+                    'From': comparison['From'].strftime('%d-%m-%Y'),
+                    'To': comparison['To'].strftime('%d-%m-%Y'),
+                    'Errors': json.loads(errors.to_json(orient="records")),
+                    'Overall': error_metrics
+                }) + "\n")
+            else:
+                write_table(errors, args.format)
+        return 0
+
+    except Exception as error:
+        print(f"Error: {error}", file=sys.stderr)
+        return 1
+
 def main():
     while True:
         clear_screen()
         display_menu()
-        csv_file.get_csv()
+        csv_file.get_csv(load=False)
 
         try:
-            choice = input("\nEnter your choice (0-19): ").strip()
+            choice = input("\nEnter your choice (0-22): ").strip()
             
             if choice == "0":
                 print("\nThank you for using the Financial Management System!")
                 break
                 
             elif choice == "1":
-                view_data()
+                functions.view_data()
                 input("\nPress Enter to continue...")
                 
             elif choice == "2":
-                add_data()
+                functions.add_data()
                 input("\nPress Enter to continue...")
                 
             elif choice == "3":
-                delete_transaction()
+                functions.delete_transaction()
                 input("\nPress Enter to continue...")
                 
             elif choice == "4":
-                edit_transaction()
+                functions.edit_transaction()
                 input("\nPress Enter to continue...")
                 
             elif choice == "5":
@@ -128,6 +324,16 @@ def main():
                 filter.summary_of_all_data()
                 input("\nPress Enter to continue...")
                 
+            elif choice == "20":
+                print("\nLargest Expenses")
+                try:
+                    count = int(input("How many expenses to show? (default: 10): ") or "10")
+                except ValueError:
+                    print("Invalid input. Showing 10.")
+                    count = 10
+                filter.top_expenses(count)
+                input("\nPress Enter to continue...")
+                
             elif choice == "10":
                 print("\nGenerating Income/Expense Trends...")
                 graphing.visualize_all_data()
@@ -158,6 +364,15 @@ def main():
                 graphing.visualize_use_cases_by_type()
                 input("\nPress Enter to continue...")
                 
+            elif choice == "21":
+                print("\nSaving all reports...")
+                saved = graphing.render_all()
+                for name, result in saved.items():
+                    print(f"{name:<20} {result['File']:<40} {result['Cache']}")
+                hits = sum(result['Cache'] == 'hit' for result in saved.values())
+                print(f"{len(saved)} charts saved to 'reports/' ({hits} cache hits, {len(saved) - hits} rendered)")
+                input("\nPress Enter to continue...")
+                
             elif choice == "16":
                 print("\nGenerating Future Predictions...")
                 try:
@@ -214,6 +429,18 @@ def main():
                         predictions.get_comparison_summary(comparison_data, error_metrics)
                 input("\nPress Enter to continue...")
                 
+            elif choice == "22":
+                print("\nGenerating Predictions by Use...")
+                try:
+                    days = int(input("Enter number of days to predict (default: 30): ") or "30")
+                except ValueError:
+                    print("Invalid input. Using default 30 days.")
+                    days = 30
+                by_currency = input("Split each use by currency? (y/n): ").strip().lower() == 'y'
+                forecast, r2_scores = predictions.predict_by_category(days, by_currency)
+                predictions.get_category_summary(forecast, r2_scores)
+                input("\nPress Enter to continue...")
+                
             else:
                 print("\nInvalid choice. Please try again.")
                 input("\nPress Enter to continue...")
@@ -223,4 +450,7 @@ def main():
             input("\nPress Enter to continue...")
 
 
-main()
\ No newline at end of file
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(run_command(sys.argv[1:]))
+    main()
@@ -1,87 +1,223 @@
 from core import *
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
-from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import PolynomialFeatures
-from sklearn.metrics import r2_score
+from aggregation import aggregation
+import atexit
+import json
 import warnings
 warnings.filterwarnings('ignore')
 
 class predictions(csv_file):
+    DEGREE = 2 # quadratic trend in the day number
+    TARGETS = ['Income', 'Expenses', 'Net'] # fitted side by side as the columns of one target matrix
+    SCALE = 365.25 # days per unit of model time
+    MIN_HISTORY = 10 # transaction days a backtest fold needs before its first forecast
+    _model = None # normal-equation statistics, see model()
+    _model_key = None # ('rollups', version) it follows, or ('series', key) in a base currency or with SQLite
+    _model_dirty = False # changed since it was last written next to data.csv
+
+    @classmethod
+    def design(self, t):
+        # Polynomial features [1, t, t**2, ...], one row per point in time
+        return np.vander(np.asarray(t, dtype='float64'), self.DEGREE + 1, increasing=True)
+
+    @classmethod
+    def time_axis(self, dates, origin):
+        # Dates -> model time: years since the model's fixed origin, which keeps the powers of t well scaled
+        return (np.asarray(dates, dtype='datetime64[D]') - np.datetime64(origin, 'D')).astype('float64') / self.SCALE
+
+    @classmethod
+    def score(self, residual, total):
+        # R² per target; a flat series scores 1 when it is matched exactly and 0 otherwise, like sklearn's r2_score
+        flat = total <= 1e-12 * np.maximum(np.abs(total), 1)
+        return np.where(flat, np.where(residual > 1e-12, 0.0, 1.0), 1 - residual / np.where(flat, 1, total))
+
     @classmethod
-    def prepare_data(self):
+    def fit(self, t, targets):
+        # One least-squares solve for all target columns at once, plus the R² of each on the points it was fitted to
+        X = self.design(t)
+        coefficients = np.linalg.lstsq(X, targets, rcond=None)[0]
+        residual = ((targets - X @ coefficients) ** 2).sum(axis=0)
+        total = ((targets - targets.mean(axis=0)) ** 2).sum(axis=0)
+        return coefficients, self.score(residual, total)
+
+    @classmethod
+    def model_file(self):
+        return self.CSV_FILE + '.model'
+
+    @classmethod
+    def model(self):
+        # Normal-equation statistics of the fit over transaction days, kept in step with the ledger:
+        # origin and last day, per-day totals (minor units), power sums of t, X'Y and Y'Y.
+        # Follows every add, edit and delete through the rollup hook; refitting only happens when it falls out of step.
+        native = not self.BASE_CURRENCY and not self.storage() # deltas arrive in the ledger's own currencies
+        if native:
+            self.rollups()
+            key = ('rollups', csv_file._rollups_version)
+        else:
+            self.daily_series()
+            key = ('series', csv_file._series_key)
+        if predictions._model is not None and predictions._model_key == key:
+            return predictions._model
+        state = None
+        if native:
+            state = self.read_model() # sets _model_dirty when it had to catch up with the rollups log
+        if state is None:
+            state = self.build_model()
+            predictions._model_dirty = native
+        predictions._model = state
+        predictions._model_key = key
+        return state
+
+    @classmethod
+    def read_model(self):
+        # The model sidecar brought up to the current rollups through their log, None if it cannot get there
+        # or has another degree. Writes made without loading the model (a batch add) only reach that log.
         try:
-            # Read and prepare data
-            df = pd.read_csv(self.CSV_FILE)
-            df["Date"] = pd.to_datetime(df["Date"], format="%d-%m-%Y")
-            df = df.sort_values("Date")
-            
-            # Create daily aggregates
-            daily_data = df.groupby('Date').agg({
-                'Amount': lambda x: {
-                    'Income': x[x > 0].sum(),
-                    'Expenses': abs(x[x < 0].sum()),
-                    'Net': x.sum()
+            with np.load(self.model_file(), allow_pickle=False) as saved:
+                rows = csv_file.read_rollup_log(str(saved['signature']), csv_file._rollups_key)
+                if rows is None or int(saved['degree']) != self.DEGREE:
+                    return None
+                origin, last = saved['origin'][()], saved['last'][()] # NaT while there are no transaction days
+                state = {
+                    'degree': self.DEGREE,
+                    'origin': None if np.isnat(origin) else origin,
+                    'last': None if np.isnat(last) else last,
+                    'days': dict(zip(saved['dates'].tolist(), saved['rows'].tolist())),
+                    'powers': saved['powers'],
+                    'xty': saved['xty'],
+                    'yy': saved['yy'],
+                    'fit': None
                 }
-            }).reset_index()
-            
-            # Create features for prediction
-            daily_data['Days'] = (daily_data['Date'] - daily_data['Date'].min()).dt.days
-            
-            return daily_data
-        except Exception as e:
-            print(f"Error preparing data: {e}")
+        except (OSError, ValueError, KeyError):
             return None
+        changes = {}
+        for date, currency, use, income, expenses, net, income_count, expense_count in rows:
+            change = changes.setdefault(np.datetime64(date, 'D').tolist(), [0, 0, 0, 0])
+            for position, value in enumerate((income, expenses, net, income_count + expense_count)):
+                change[position] += value
+        self.fold(state, changes)
+        predictions._model_dirty = bool(changes)
+        return state
+
+    @classmethod
+    def build_model(self):
+        # Statistics from scratch, in one vectorized pass over the shared daily series
+        series = self.daily_series()
+        active = np.flatnonzero(series['Count'].values > 0)
+        dates = series.index.values[active].astype('datetime64[D]')
+        origin = dates[0] if len(dates) else None
+        totals = np.column_stack([np.rint(series[target].values[active] * self.MINOR_UNITS) for target in self.TARGETS])
+        rows = np.column_stack([totals, series['Count'].values[active]]).astype('int64')
+        state = {
+            'degree': self.DEGREE,
+            'origin': origin,
+            'last': dates[-1] if len(dates) else None,
+            'days': dict(zip(dates.tolist(), rows.tolist())),
+            'powers': np.zeros(2 * self.DEGREE + 1),
+            'xty': np.zeros((self.DEGREE + 1, len(self.TARGETS))),
+            'yy': np.zeros(len(self.TARGETS)),
+            'fit': None
+        }
+        if len(dates):
+            t = self.time_axis(dates, origin)
+            targets = self.major(totals)
+            state['powers'] = np.vander(t, 2 * self.DEGREE + 1, increasing=True).sum(axis=0)
+            state['xty'] = self.design(t).T @ targets
+            state['yy'] = (targets ** 2).sum(axis=0)
+        return state
+
+    @classmethod
+    def update_model(self, parts, version):
+        # Rollup hook: fold the days a change touched (signed parts) into the statistics.
+        # Only a model that matched the rollups before the change can follow it, any other is rebuilt when next used.
+        if predictions._model is None or predictions._model_key != ('rollups', version):
+            return
+        state = predictions._model
+        changes = {}
+        dates = parts.index.get_level_values('Date').values.astype('datetime64[D]').tolist()
+        for date, (income, expenses, net, income_count, expense_count) in zip(dates, parts.values.tolist()):
+            change = changes.setdefault(date, [0, 0, 0, 0])
+            for position, value in enumerate((income, expenses, net, income_count + expense_count)):
+                change[position] += value
+        self.fold(state, changes)
+        predictions._model_key = ('rollups', csv_file._rollups_version)
+        predictions._model_dirty = True
+
+    @classmethod
+    def fold(self, state, changes):
+        # Apply per-day changes {date: [income, expenses, net, count]} (minor units) to the statistics, a rank-1 update per day
+        for date, change in changes.items():
+            if state['origin'] is None:
+                state['origin'] = np.datetime64(date, 'D')
+            old = state['days'].get(date, [0, 0, 0, 0])
+            new = [before + delta for before, delta in zip(old, change)]
+            t = float(self.time_axis(np.datetime64(date, 'D'), state['origin']))
+            for row, weight in ((old, -1), (new, 1)):
+                if row[3] > 0: # the day is one of the fitted points
+                    y = self.major(np.array(row[:3], dtype='float64'))
+                    x = t ** np.arange(self.DEGREE + 1)
+                    state['powers'] += weight * t ** np.arange(2 * self.DEGREE + 1)
+                    state['xty'] += weight * np.outer(x, y)
+                    state['yy'] += weight * y ** 2
+            if new[3] > 0:
+                state['days'][date] = new
+                if state['last'] is None or np.datetime64(date, 'D') > state['last']:
+                    state['last'] = np.datetime64(date, 'D')
+            else:
+                state['days'].pop(date, None)
+                if state['last'] is not None and np.datetime64(date, 'D') == state['last']:
+                    state['last'] = np.datetime64(max(state['days']), 'D') if state['days'] else None
+        state['fit'] = None
+
+    @classmethod
+    def save_model(self):
+        # Written at exit next to data.csv, like the rollups it follows
+        if not predictions._model_dirty or predictions._model is None:
+            return
+        try:
+            if predictions._model_key != ('rollups', csv_file._rollups_version) or csv_file._rollups_key != self.ledger_signature():
+                return
+            state = predictions._model
+            with open(self.model_file(), 'wb') as out:
+                np.savez(out, signature=json.dumps(csv_file._rollups_key), degree=state['degree'],
+                         origin=np.datetime64(state['origin'], 'D'), last=np.datetime64(state['last'], 'D'),
+                         dates=np.array(list(state['days']), dtype='datetime64[D]'),
+                         rows=np.array(list(state['days'].values()), dtype='int64').reshape(len(state['days']), 4),
+                         powers=state['powers'], xty=state['xty'], yy=state['yy'])
+            predictions._model_dirty = False
+        except OSError:
+            pass
+
+    @classmethod
+    def solve(self, state):
+        # Coefficients and R² straight from the statistics, cached until the next change
+        if state['fit'] is None:
+            size = self.DEGREE + 1
+            xtx = state['powers'][np.add.outer(np.arange(size), np.arange(size))]
+            xty = state['xty']
+            coefficients = np.linalg.lstsq(xtx, xty, rcond=None)[0]
+            residual = np.maximum(state['yy'] - 2 * (coefficients * xty).sum(axis=0) + (coefficients * (xtx @ coefficients)).sum(axis=0), 0)
+            total = np.maximum(state['yy'] - xty[0] ** 2 / state['powers'][0], 0)
+            state['fit'] = (coefficients, self.score(residual, total))
+        return state['fit']
 
     @classmethod
     def predict_future(self, days_to_predict=30):
         try:
-            daily_data = self.prepare_data()
-            if daily_data is None:
-                return None
-
-            # Prepare features for prediction
-            X = daily_data['Days'].values.reshape(-1, 1)
-            y_income = daily_data['Amount'].apply(lambda x: x['Income']).values
-            y_expenses = daily_data['Amount'].apply(lambda x: x['Expenses']).values
-            y_net = daily_data['Amount'].apply(lambda x: x['Net']).values
-
-            # Create polynomial features
-            poly = PolynomialFeatures(degree=2)
-            X_poly = poly.fit_transform(X)
-
-            # Train models
-            models = {
-                'Income': LinearRegression(),
-                'Expenses': LinearRegression(),
-                'Net': LinearRegression()
-            }
-
-            models['Income'].fit(X_poly, y_income)
-            models['Expenses'].fit(X_poly, y_expenses)
-            models['Net'].fit(X_poly, y_net)
-
-            # Generate future dates
-            last_date = daily_data['Date'].max()
-            future_dates = [last_date + timedelta(days=x) for x in range(1, days_to_predict + 1)]
-            future_days = np.array([(date - daily_data['Date'].min()).days for date in future_dates]).reshape(-1, 1)
-            future_days_poly = poly.transform(future_days)
-
-            # Make predictions
-            predictions = {
-                'Dates': future_dates,
-                'Income': models['Income'].predict(future_days_poly),
-                'Expenses': models['Expenses'].predict(future_days_poly),
-                'Net': models['Net'].predict(future_days_poly)
-            }
-
-            # Calculate R² scores
-            r2_scores = {
-                'Income': r2_score(y_income, models['Income'].predict(X_poly)),
-                'Expenses': r2_score(y_expenses, models['Expenses'].predict(X_poly)),
-                'Net': r2_score(y_net, models['Net'].predict(X_poly))
-            }
+            # Fitted model for the current ledger, no refit unless it changed in a way the statistics could not follow
+            state = self.model()
+            if not state['days']:
+                raise ValueError("No transactions to learn from.")
+            coefficients, r2 = self.solve(state)
+
+            # Forecast the days after the last transaction, Income, Expenses and Net together
+            dates = state['last'] + np.arange(1, days_to_predict + 1).astype('timedelta64[D]')
+            forecast = self.design(self.time_axis(dates, state['origin'])) @ coefficients
+
+            predictions = {'Dates': list(pd.DatetimeIndex(dates.astype('datetime64[ns]')))}
+            predictions.update(zip(self.TARGETS, forecast.T))
+            r2_scores = dict(zip(self.TARGETS, r2.tolist()))
 
             return predictions, r2_scores
 
@@ -89,6 +225,78 @@ class predictions(csv_file):
             print(f"Error making predictions: {e}")
             return None
 
+    @classmethod
+    def predict_by_category(self, days_to_predict=30, by_currency=False):
+        # Forecast for every Use (and currency, with by_currency) at once. All categories are fitted on the ledger's
+        # transaction days, zero where they had nothing, so they share one design matrix and one least-squares solve.
+        # By linearity their forecasts then add up to the overall one; what rounding leaves is spread back over them.
+        # Returns long rows (Date, Use[, Currency], Income, Expenses, Net) and R² per category.
+        series = self.daily_series()
+        active = np.flatnonzero(series['Count'].values > 0)
+        if not len(active):
+            raise ValueError("No transactions to learn from.")
+        days = self.rollup('day')
+        keys = [days.index.get_level_values('Use')]
+        if by_currency:
+            keys.append(days.index.get_level_values('Currency'))
+        codes, categories = aggregation.group_codes(keys)
+        rows = np.searchsorted(active, (days.index.get_level_values('Date') - series.index[0]) // pd.Timedelta(days=1))
+        cells = rows * len(categories) + codes # (transaction day, category) of every rollup bucket
+        targets = np.stack([np.bincount(cells, weights=days[target].values, minlength=len(active) * len(categories))
+                            for target in self.TARGETS], axis=-1)
+        targets = self.major(targets).reshape(len(active), len(categories) * len(self.TARGETS))
+
+        coefficients, r2 = self.fit(active / self.SCALE, targets)
+        future_days = active[-1] + np.arange(1, days_to_predict + 1)
+        forecast = (self.design(future_days / self.SCALE) @ coefficients).reshape(days_to_predict, len(categories), len(self.TARGETS))
+
+        # Reconcile with the overall forecast, each category taking a share of the gap in proportion to its size
+        state = self.model()
+        coefficients = self.solve(state)[0]
+        dates = state['last'] + np.arange(1, days_to_predict + 1).astype('timedelta64[D]')
+        total = self.design(self.time_axis(dates, state['origin'])) @ coefficients
+        size = np.abs(forecast)
+        weights = np.where(size.sum(axis=1, keepdims=True) > 0, size / np.maximum(size.sum(axis=1, keepdims=True), 1e-300), 1 / len(categories))
+        forecast += weights * (total - forecast.sum(axis=1))[:, None, :]
+
+        result = pd.DataFrame({'Date': np.repeat(dates.astype('datetime64[ns]'), len(categories))})
+        for name in categories.names:
+            result[name] = np.tile(categories.get_level_values(name), days_to_predict)
+        for column, target in enumerate(self.TARGETS):
+            result[target] = forecast[:, :, column].ravel()
+        index = categories if by_currency else categories.get_level_values('Use')
+        r2_scores = pd.DataFrame(r2.reshape(len(categories), len(self.TARGETS)), index=index, columns=self.TARGETS)
+        return result, r2_scores
+
+    @classmethod
+    def get_category_summary(self, forecast, r2_scores):
+        try:
+            if forecast is None:
+                return
+
+            keys = [name for name in r2_scores.index.names]
+            totals = forecast.groupby(keys, sort=False)[self.TARGETS].sum()
+            totals = totals.join(r2_scores['Net'].rename('R2')).sort_values('Expenses', ascending=False)
+
+            print("\nPrediction Summary by Category:")
+            print("=" * 90)
+            print(f"Prediction Period: {forecast['Date'].min().strftime('%d-%m-%Y')} to {forecast['Date'].max().strftime('%d-%m-%Y')}")
+            print("-" * 90)
+            label = " / ".join(keys)
+            print(f"{label:<40} {'Income':>12} {'Expenses':>12} {'Net':>12} {'R² (Net)':>10}")
+            print("-" * 90)
+            lines = [f"{' / '.join(map(str, key if isinstance(key, tuple) else (key,)))[:40]:<40} "
+                     f"{row.Income:>12.2f} {row.Expenses:>12.2f} {row.Net:>12.2f} {row.R2:>10.3f}"
+                     for key, row in zip(totals.index, totals.itertuples(index=False))]
+            print("\n".join(lines))
+            print("-" * 90)
+            print(f"{'Total':<40} {totals['Income'].sum():>12.2f} {totals['Expenses'].sum():>12.2f} {totals['Net'].sum():>12.2f}")
+            print("=" * 90)
+            print("\nNote: Category forecasts are reconciled so they add up to the overall prediction.")
+
+        except Exception as e:
+            print(f"Error generating category summary: {e}")
+
     @classmethod
     def get_prediction_summary(self, predictions, r2_scores):
         try:
@@ -124,69 +332,48 @@ class predictions(csv_file):
         except Exception as e:
             print(f"Error generating prediction summary: {e}")
 
+    @classmethod
+    def backtest(self, horizon=30, step=1):
+        # Walk-forward backtest: at every transaction day with enough history before it (every step-th one),
+        # fit on everything up to that day, forecast the next `horizon` calendar days and compare with what happened.
+        # Running sums of the normal-equation terms give every fold's fit at once, one batched solve for all of them.
+        series = self.daily_series()
+        actual = np.column_stack([series[target].values for target in self.TARGETS])
+        active = series['Count'].values > 0
+        position = np.arange(len(series))
+        t = position / self.SCALE
+        powers = np.cumsum(np.vander(t, 2 * self.DEGREE + 1, increasing=True) * active[:, None], axis=0)
+        xty = np.cumsum(self.design(t)[:, :, None] * (actual * active[:, None])[:, None, :], axis=0)
+        origins = np.flatnonzero(active & (np.cumsum(active) >= self.MIN_HISTORY) & (position + horizon < len(series)))[::step]
+        if not len(origins):
+            raise ValueError(f"Not enough history for a {horizon} day backtest (needs {self.MIN_HISTORY} transaction days and {horizon} more after them).")
+        size = self.DEGREE + 1
+        coefficients = np.linalg.pinv(powers[origins][:, np.add.outer(np.arange(size), np.arange(size))]) @ xty[origins]
+        ahead = origins[:, None] + np.arange(1, horizon + 1) # folds x horizon days
+        predicted = np.einsum('fhk,fkj->fhj', self.design(t[ahead].ravel()).reshape(len(origins), horizon, size), coefficients)
+        errors = predicted - actual[ahead]
+        mae = np.abs(errors).mean(axis=0) # horizon x target
+        rmse = np.sqrt((errors ** 2).mean(axis=0))
+        comparison = {
+            'Horizon': np.arange(1, horizon + 1),
+            'Folds': len(origins),
+            'From': series.index[origins[0]],
+            'To': series.index[origins[-1]]
+        }
+        for column, target in enumerate(self.TARGETS):
+            comparison[f'Predicted_{target}'] = predicted[:, :, column].mean(axis=0)
+            comparison[f'Actual_{target}'] = actual[ahead][:, :, column].mean(axis=0)
+            comparison[f'MAE_{target}'] = mae[:, column]
+            comparison[f'RMSE_{target}'] = rmse[:, column]
+        error_metrics = {target: {'MAE': float(np.abs(errors[:, :, column]).mean()), 'RMSE': float(np.sqrt((errors[:, :, column] ** 2).mean()))}
+                         for column, target in enumerate(self.TARGETS)}
+        return comparison, error_metrics
+
     @classmethod
     def compare_predictions_with_actual(self, days_to_compare=30):
         try:
-            # Get predictions for the past period
-            predictions_data, r2_scores = self.predict_future(days_to_compare)
-            if predictions_data is None:
-                return None
-
-            # Get actual data for the same period
-            df = pd.read_csv(self.CSV_FILE)
-            df["Date"] = pd.to_datetime(df["Date"], format="%d-%m-%Y")
-            
-            # Filter data for the prediction period
-            start_date = predictions_data['Dates'][0]
-            end_date = predictions_data['Dates'][-1]
-            mask = (df['Date'] >= start_date) & (df['Date'] <= end_date)
-            actual_data = df[mask]
-
-            # Aggregate actual data by date
-            actual_daily = actual_data.groupby('Date').agg({
-                'Amount': lambda x: {
-                    'Income': x[x > 0].sum(),
-                    'Expenses': abs(x[x < 0].sum()),
-                    'Net': x.sum()
-                }
-            }).reset_index()
-
-            # Calculate differences
-            comparison = {
-                'Dates': predictions_data['Dates'],
-                'Predicted_Income': predictions_data['Income'],
-                'Actual_Income': [0] * len(predictions_data['Dates']),
-                'Predicted_Expenses': predictions_data['Expenses'],
-                'Actual_Expenses': [0] * len(predictions_data['Dates']),
-                'Predicted_Net': predictions_data['Net'],
-                'Actual_Net': [0] * len(predictions_data['Dates'])
-            }
-
-            # Fill in actual values where available
-            for date in actual_daily['Date']:
-                idx = predictions_data['Dates'].index(date)
-                actual_values = actual_daily[actual_daily['Date'] == date]['Amount'].iloc[0]
-                comparison['Actual_Income'][idx] = actual_values['Income']
-                comparison['Actual_Expenses'][idx] = actual_values['Expenses']
-                comparison['Actual_Net'][idx] = actual_values['Net']
-
-            # Calculate error metrics
-            error_metrics = {
-                'Income': {
-                    'MAE': np.mean(np.abs(np.array(comparison['Predicted_Income']) - np.array(comparison['Actual_Income']))),
-                    'RMSE': np.sqrt(np.mean((np.array(comparison['Predicted_Income']) - np.array(comparison['Actual_Income']))**2))
-                },
-                'Expenses': {
-                    'MAE': np.mean(np.abs(np.array(comparison['Predicted_Expenses']) - np.array(comparison['Actual_Expenses']))),
-                    'RMSE': np.sqrt(np.mean((np.array(comparison['Predicted_Expenses']) - np.array(comparison['Actual_Expenses']))**2))
-                },
-                'Net': {
-                    'MAE': np.mean(np.abs(np.array(comparison['Predicted_Net']) - np.array(comparison['Actual_Net']))),
-                    'RMSE': np.sqrt(np.mean((np.array(comparison['Predicted_Net']) - np.array(comparison['Actual_Net']))**2))
-                }
-            }
-
-            return comparison, error_metrics
+            # Honest accuracy: forecasts made in the past, checked against the days that followed them
+            return self.backtest(days_to_compare)
 
         except Exception as e:
             print(f"Error comparing predictions with actual data: {e}")
@@ -198,13 +385,14 @@ class predictions(csv_file):
             if comparison is None:
                 return
 
-            print("\nPrediction vs Actual Comparison Summary:")
+            print("\nWalk-forward Backtest Summary:")
             print("=" * 80)
-            print(f"Comparison Period: {comparison['Dates'][0].strftime('%d-%m-%Y')} to {comparison['Dates'][-1].strftime('%d-%m-%Y')}")
+            print(f"Forecasts made on {comparison['Folds']} days from {comparison['From'].strftime('%d-%m-%Y')} to {comparison['To'].strftime('%d-%m-%Y')}, "
+                  f"each {len(comparison['Horizon'])} days ahead")
             print("-" * 80)
             
             # Calculate averages
-            print("\nAverage Values:")
+            print("\nAverage Daily Values:")
             print(f"{'Metric':<15} {'Predicted':>15} {'Actual':>15} {'Difference':>15}")
             print("-" * 80)
             
@@ -220,10 +408,21 @@ class predictions(csv_file):
             
             for metric in ['Income', 'Expenses', 'Net']:
                 print(f"{metric:<15} {error_metrics[metric]['MAE']:>15.2f} {error_metrics[metric]['RMSE']:>15.2f}")
+
+            # How the error grows with the distance from the day the forecast was made
+            horizons = sorted({1, 7, 14, 30, 60, 90, len(comparison['Horizon'])} & set(comparison['Horizon'].tolist()))
+            print("\nMAE by Days Ahead:")
+            print(f"{'Days':<15}" + "".join(f"{metric:>15}" for metric in ['Income', 'Expenses', 'Net']))
+            print("-" * 80)
+            for day in horizons:
+                print(f"{day:<15}" + "".join(f"{comparison[f'MAE_{metric}'][day - 1]:>15.2f}" for metric in ['Income', 'Expenses', 'Net']))
             
             print("=" * 80)
             print("\nNote: MAE (Mean Absolute Error) and RMSE (Root Mean Square Error) indicate prediction accuracy.")
             print("Lower values indicate better predictions.")
 
         except Exception as e:
-            print(f"Error generating comparison summary: {e}") 
\ No newline at end of file
+            print(f"Error generating comparison summary: {e}") 
+
+csv_file._rollup_hooks.append(predictions.update_model)
+atexit.register(predictions.save_model)
@@ -0,0 +1,89 @@
+from core import csv_file
+import pandas as pd
+import numpy as np
+import os
+import sys
+
+class table: # Prints transactions a page at a time, each page formatted column-wise and written in one go.
+    PAGE_SIZE = int(os.environ.get('FINANCES_PAGE_SIZE', 20)) # rows per page
+
+    @classmethod
+    def text(self, values, width, align='<'):
+        # A whole column as padded strings, missing values shown empty
+        values = pd.Series(values).astype(object).fillna('').astype(str)
+        return values.str.ljust(width) if align == '<' else values.str.rjust(width)
+
+    @classmethod
+    def lines(self, window, index=False, comment=False):
+        # Formatted rows for the visible window only, one vectorized pass per column
+        amounts = window['Amount'].to_numpy()
+        columns = [
+            self.text(window['Date'].dt.strftime('%d-%m-%Y').to_numpy(), 12),
+            pd.Series(np.char.mod('%10.2f', csv_file.major(amounts))),
+            self.text(window['Currency'].to_numpy(), 10, '>'),
+            self.text(np.where(amounts > 0, 'Income', 'Expense'), 10, '>'),
+            self.text(window['Use'].to_numpy(), 30)
+        ]
+        if comment:
+            columns.append(self.text(window['Comment'].to_numpy(), 30))
+        if index:
+            columns.insert(0, self.text(window.index.to_numpy(), 6))
+        return columns[0].str.cat(columns[1:], sep=' ').tolist()
+
+    @classmethod
+    def header(self, index=False, comment=False):
+        header = f"{'Date':<12} {'Amount':>10} {'Currency':>10} {'Type':>10} {'Use':<30}"
+        if comment:
+            header += f" {'Comment':<30}"
+        if index:
+            header = f"{'Index':<6} " + header
+        return header
+
+    @classmethod
+    def page(self, df, number, title, size=None, index=False, comment=False):
+        # One page (0-based number) as a single string, framed like the rest of the reports
+        size = size or self.PAGE_SIZE
+        pages = self.pages(df, size)
+        start = number * size
+        window = df.iloc[start:start + size]
+        width = 100 if (comment or index) else 70
+        parts = [f"\n{title}", "=" * width, self.header(index, comment), "-" * width]
+        parts += self.lines(window, index, comment)
+        parts.append("=" * width)
+        if pages > 1:
+            parts.append(f"Page {number + 1} of {pages} (rows {start + 1}-{start + len(window)} of {len(df)})")
+        return "\n".join(parts) + "\n"
+
+    @classmethod
+    def pages(self, df, size=None):
+        size = size or self.PAGE_SIZE
+        return max(1, -(-len(df) // size))
+
+    @classmethod
+    def write(self, text):
+        # single buffered write instead of one print per row
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+    @classmethod
+    def browse(self, df, title, index=False, comment=False, prompt=None, size=None):
+        # Show df page by page. n/p turn pages and "g <page>" jumps. Without a prompt anything else stops browsing;
+        # with a prompt (the delete/edit pickers) any other answer is returned to the caller.
+        pages = self.pages(df, size)
+        number = 0
+        while True:
+            self.write(self.page(df, number, title, size, index, comment))
+            if prompt is None and pages == 1:
+                return None
+            answer = input(prompt or "[n]ext, [p]revious, g <page>, or Enter to stop: ").strip()
+            command = answer.lower()
+            if command == 'n':
+                number = min(number + 1, pages - 1)
+            elif command == 'p':
+                number = max(number - 1, 0)
+            elif command.startswith('g') and command[1:].strip().isdigit():
+                number = min(max(int(command[1:].strip()) - 1, 0), pages - 1)
+            elif prompt is None:
+                return None
+            else:
+                return answer
@@ -0,0 +1,49 @@
+from lazy import lazy_module
+import os
+
+np = lazy_module('numpy')
+
+class sampling: # Thins long series before plotting while keeping their visual shape (peaks and troughs).
+    POINTS = int(os.environ.get('FINANCES_PLOT_POINTS', 2000)) # most points drawn per line, 0 draws everything
+
+    @classmethod
+    def lttb(self, x, y, points=None):
+        # Largest-Triangle-Three-Buckets: positions of at most `points` samples of (x, y), first and last always kept.
+        # Each bucket keeps the point spanning the largest triangle with the previous pick and the next bucket's mean.
+        points = self.POINTS if points is None else points
+        x = np.asarray(x, dtype='float64')
+        y = np.asarray(y, dtype='float64')
+        n = len(x)
+        if points <= 0 or n <= points or points < 3:
+            return np.arange(n)
+        bounds = (np.arange(points - 1) * ((n - 2) / (points - 2))).astype('int64') + 1 # bucket i is bounds[i]:bounds[i + 1]
+        bounds[-1] = n - 1
+        sum_x = np.concatenate(([0.0], np.cumsum(x)))
+        sum_y = np.concatenate(([0.0], np.cumsum(y)))
+        ends = np.append(bounds[2:], n) # the next bucket of the last one is the final point
+        starts = bounds[1:]
+        mean_x = (sum_x[ends] - sum_x[starts]) / (ends - starts)
+        mean_y = (sum_y[ends] - sum_y[starts]) / (ends - starts)
+        picked = np.empty(points, dtype='int64')
+        picked[0], picked[-1] = 0, n - 1
+        a = 0
+        for i in range(points - 2):
+            start, end = bounds[i], bounds[i + 1]
+            areas = np.abs((x[a] - mean_x[i]) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (mean_y[i] - y[a]))
+            a = start + int(areas.argmax())
+            picked[i + 1] = a
+        return picked
+
+    @classmethod
+    def thin(self, x, y, points=None):
+        # (x, y) ready for plot(): gaps (NaN) dropped and the rest reduced with lttb. Dates are fine as x.
+        x = np.asarray(x)
+        y = np.asarray(y, dtype='float64')
+        keep = ~np.isnan(y)
+        if not keep.all():
+            x, y = x[keep], y[keep]
+        if x.dtype == object: # e.g. a list of Timestamps
+            x = x.astype('datetime64[ns]')
+        position = x.astype('datetime64[ns]').astype('int64') if np.issubdtype(x.dtype, np.datetime64) else x
+        picked = self.lttb(position, y, points)
+        return x[picked], y[picked]
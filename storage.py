@@ -0,0 +1,181 @@
+from core import csv_file
+import pandas as pd
+import sqlite3
+import os
+
+class sqlite_storage: # Keeps the ledger in an indexed SQLite database instead of data.csv.
+    DB_FILE = 'data.db'
+    _connection = None
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS ledger (
+            id INTEGER PRIMARY KEY,
+            Date TEXT NOT NULL,
+            Amount REAL NOT NULL,
+            Currency TEXT,
+            Use TEXT,
+            Comment TEXT
+        );
+        CREATE INDEX IF NOT EXISTS ledger_date ON ledger (Date);
+        CREATE INDEX IF NOT EXISTS ledger_amount ON ledger (Amount);
+        CREATE INDEX IF NOT EXISTS ledger_currency ON ledger (Currency);
+        CREATE INDEX IF NOT EXISTS ledger_use ON ledger (Use);
+    """
+
+    @classmethod
+    def connect(self):
+        # One connection per session, the database is created (and seeded from data.csv) on first use
+        if sqlite_storage._connection is None:
+            if not os.path.exists(self.DB_FILE):
+                self.create()
+            connection = sqlite3.connect(self.DB_FILE, check_same_thread=False)
+            connection.executescript(self.SCHEMA)
+            sqlite_storage._connection = connection
+        return sqlite_storage._connection
+
+    @classmethod
+    def create(self):
+        # Build the database under a temporary name and only move it into place once the import succeeded,
+        # so a failed import never leaves an empty data.db that would pass for a seeded one
+        temp_file = self.DB_FILE + '.tmp'
+        if os.path.exists(temp_file):
+            os.remove(temp_file) # left over from an import that died
+        connection = sqlite3.connect(temp_file, check_same_thread=False)
+        try:
+            connection.executescript(self.SCHEMA)
+            sqlite_storage._connection = connection # import_csv writes through connect()
+            self.import_csv()
+        except Exception:
+            connection.close()
+            os.remove(temp_file)
+            raise
+        finally:
+            sqlite_storage._connection = None
+        connection.close()
+        os.replace(temp_file, self.DB_FILE)
+
+    @classmethod
+    def import_csv(self, path=None):
+        # Copy an existing data.csv (with its patch log applied) into the database.
+        path = path or csv_file.CSV_FILE
+        if not os.path.exists(path):
+            return 0
+        df = pd.read_csv(path)
+        df['Date'] = csv_file.standardize_dates(df['Date'])
+        df = csv_file.typed(df)
+        if path == csv_file.CSV_FILE:
+            df.index = csv_file.row_ids(0, len(df))
+            df = csv_file.apply_patches(df, *csv_file.read_patches())
+        df = df[~((df['Use'] == csv_file.SAMPLE_ROW['Use']) & (df['Comment'] == csv_file.SAMPLE_ROW['Comment']))]
+        df = df.astype({column: object for column in csv_file.CATEGORIES})
+        df['Date'] = df['Date'].dt.strftime("%d-%m-%Y")
+        df['Amount'] = csv_file.major(df['Amount'])
+        return self.add_many(df[csv_file.Columns].to_dict('records'))
+
+    @classmethod
+    def where(self, min_amount=None, max_amount=None, start=None, end=None, kind=None):
+        # Build a WHERE clause the indexes can answer, dates are stored as YYYY-MM-DD so they sort as text
+        clauses, params = [], []
+        if min_amount is not None:
+            clauses.append("Amount >= ?")
+            params.append(float(min_amount))
+        if max_amount is not None:
+            clauses.append("Amount <= ?")
+            params.append(float(max_amount))
+        if start is not None:
+            clauses.append("Date >= ?")
+            params.append(pd.Timestamp(start).strftime("%Y-%m-%d"))
+        if end is not None:
+            clauses.append("Date <= ?")
+            params.append(pd.Timestamp(end).strftime("%Y-%m-%d"))
+        if kind == 'income':
+            clauses.append("Amount > 0")
+        elif kind == 'expense':
+            clauses.append("Amount < 0")
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    @classmethod
+    def frame(self, sql, params=()):
+        # Same typed schema as csv_file.load
+        df = pd.read_sql_query(sql, self.connect(), params=params, index_col='id')
+        df.index.name = None
+        return csv_file.typed(df, date_format="%Y-%m-%d")
+
+    @classmethod
+    def load(self):
+        return self.frame("SELECT id, Date, Amount, Currency, Use, Comment FROM ledger ORDER BY id")
+
+    @classmethod
+    def query(self, **filters):
+        where, params = self.where(**filters)
+        return self.frame("SELECT id, Date, Amount, Currency, Use, Comment FROM ledger" + where + " ORDER BY id", params)
+
+    @classmethod
+    def largest_expenses(self, n=10):
+        return self.frame("SELECT id, Date, Amount, Currency, Use, Comment FROM ledger WHERE Amount < 0 ORDER BY Amount LIMIT ?", (int(n),))
+
+    @classmethod
+    def totals(self, **filters):
+        where, params = self.where(**filters)
+        row = self.connect().execute("""
+            SELECT COALESCE(SUM(CASE WHEN Amount > 0 THEN Amount END), 0),
+                   COALESCE(-SUM(CASE WHEN Amount < 0 THEN Amount END), 0),
+                   COALESCE(SUM(Amount > 0), 0),
+                   COALESCE(SUM(Amount < 0), 0)
+            FROM ledger""" + where, params).fetchone()
+        return {
+            'Income': row[0],
+            'Expenses': row[1],
+            'Net': row[0] - row[1],
+            'IncomeCount': row[2],
+            'ExpenseCount': row[3]
+        }
+
+    @classmethod
+    def rollup(self, level):
+        # Same shape as csv_file.rollup, grouped by SQLite straight off the table
+        period = "Date" if level == 'day' else "substr(Date, 1, 7) || '-01'"
+        df = pd.read_sql_query(f"""
+            SELECT {period} AS Date, COALESCE(Currency, '') AS Currency, COALESCE(Use, '') AS Use,
+                   CAST(ROUND(SUM(CASE WHEN Amount > 0 THEN Amount ELSE 0 END) * {csv_file.MINOR_UNITS}) AS INTEGER) AS Income,
+                   CAST(ROUND(-SUM(CASE WHEN Amount < 0 THEN Amount ELSE 0 END) * {csv_file.MINOR_UNITS}) AS INTEGER) AS Expenses,
+                   CAST(ROUND(SUM(Amount) * {csv_file.MINOR_UNITS}) AS INTEGER) AS Net,
+                   SUM(Amount > 0) AS IncomeCount,
+                   SUM(Amount < 0) AS ExpenseCount
+            FROM ledger GROUP BY 1, 2, 3 ORDER BY 1, 2, 3""", self.connect())
+        df['Date'] = pd.to_datetime(df['Date'], format="%Y-%m-%d")
+        return df.set_index(['Date', 'Currency', 'Use'])
+
+    @classmethod
+    def add_many(self, rows):
+        rows = [dict(row) for row in rows]
+        if not rows:
+            return 0
+        dates = pd.to_datetime(csv_file.standardize_dates([row['Date'] for row in rows]), format="%d-%m-%Y")
+        values = [
+            (date.strftime("%Y-%m-%d"), float(row['Amount']), row['Currency'], row['Use'], row['Comment'])
+            for row, date in zip(rows, dates)
+        ]
+        connection = self.connect()
+        with connection: # one transaction for the whole batch
+            connection.executemany(
+                "INSERT INTO ledger (Date, Amount, Currency, Use, Comment) VALUES (?, ?, ?, ?, ?)", values)
+        return len(values)
+
+    @classmethod
+    def delete_row(self, row_id):
+        connection = self.connect()
+        with connection:
+            connection.execute("DELETE FROM ledger WHERE id = ?", (int(row_id),))
+
+    @classmethod
+    def edit_row(self, row_id, values):
+        values = dict(values)
+        if 'Date' in values:
+            values['Date'] = pd.to_datetime(values['Date'], format="%d-%m-%Y").strftime("%Y-%m-%d")
+        columns = [column for column in csv_file.Columns if column in values]
+        connection = self.connect()
+        with connection:
+            connection.execute(
+                "UPDATE ledger SET " + ", ".join(f"{column} = ?" for column in columns) + " WHERE id = ?",
+                [values[column] for column in columns] + [int(row_id)])
@@ -0,0 +1,48 @@
+# Every test runs in its own folder with its own data.csv, and can simulate the app being started again
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import csv_file
+from predictions import predictions
+
+
+def restart(crashed=False):
+    # What the next process starts from: the exit hooks write the sidecars (not after a crash), then every
+    # in-memory cache is dropped, so only what is on disk carries over
+    if not crashed:
+        predictions.save_model()
+        csv_file.save_rollups()
+        csv_file.save_indexes()
+    csv_file._rollups = None
+    csv_file._rollups_key = None
+    csv_file._rollups_dirty = False
+    csv_file._rollups_version = 0
+    csv_file._rollup_frames = {}
+    csv_file._series = None
+    csv_file._series_key = None
+    csv_file._cache = None
+    csv_file._cache_key = None
+    csv_file._cache_rows = 0
+    csv_file._cache_tail = []
+    csv_file._indexes = {}
+    csv_file._indexes_dirty = set()
+    csv_file._ids = None
+    csv_file._ids_key = None
+    predictions._model = None
+    predictions._model_key = None
+    predictions._model_dirty = False
+
+
+@pytest.fixture
+def ledger(tmp_path, monkeypatch):
+    # An empty folder to run in, with the CSV backend and no base currency whatever the environment says
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(csv_file, 'BACKEND', 'csv')
+    monkeypatch.setattr(csv_file, 'BASE_CURRENCY', None)
+    restart(crashed=True)
+    yield tmp_path
+    restart(crashed=True) # nothing is left for the exit hooks to write into the repository
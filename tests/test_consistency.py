@@ -0,0 +1,261 @@
+# Totals, queries, monthly figures and forecasts kept up to date incrementally (rollups, their sidecar and log,
+# the model sidecar, the patch log, compaction) must always equal a brute-force recomputation over the ledger
+import csv
+import math
+import os
+import random
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import restart
+from core import csv_file
+from predictions import predictions
+
+
+class expected_ledger:
+    # What the ledger should hold, kept by hand: row id -> (date, amount in minor units, currency, use)
+    def __init__(self):
+        self.rows = {}
+        self.next_id = 0
+
+    def add(self, rows):
+        for row in rows:
+            self.rows[self.next_id] = (row['Date'], round(row['Amount'] * 100), row['Currency'], row['Use'])
+            self.next_id += 1
+
+    def edit(self, row_id, day=None, amount=None, currency=None):
+        old_day, old_amount, old_currency, use = self.rows[row_id]
+        self.rows[row_id] = (day or old_day, old_amount if amount is None else round(amount * 100), currency or old_currency, use)
+
+    def delete(self, row_id):
+        del self.rows[row_id]
+
+
+def make_row(day, amount, currency='PKR', use='Food', comment='test'):
+    return {'Date': day.strftime('%d-%m-%Y'), 'Amount': amount, 'Currency': currency, 'Use': use, 'Comment': comment}
+
+
+def random_rows(count, seed):
+    generator = random.Random(seed)
+    return [make_row(date(2024, 1, 1) + timedelta(days=generator.randrange(120)),
+                     generator.choice([-1, 1]) * generator.randrange(1, 100000) / 100,
+                     generator.choice(['PKR', 'USD', 'EUR']), generator.choice(['Food', 'Rent', 'Salary', 'Travel']))
+            for _ in range(count)]
+
+
+def add(expected, rows):
+    assert csv_file.add_many(rows) == len(rows)
+    expected.add([dict(row, Date=pd.Timestamp(pd.to_datetime(row['Date'], format='%d-%m-%Y')).date()) for row in rows])
+
+
+def brute_totals(rows):
+    amounts = [amount for _, amount, _, _ in rows]
+    income = sum(amount for amount in amounts if amount > 0)
+    expenses = -sum(amount for amount in amounts if amount < 0)
+    return {'Income': income / 100, 'Expenses': expenses / 100, 'Net': (income - expenses) / 100,
+            'IncomeCount': sum(amount > 0 for amount in amounts), 'ExpenseCount': sum(amount < 0 for amount in amounts)}
+
+
+def brute_forecast(rows, days):
+    # Quadratic least squares over the per-day totals of every transaction day, all currencies summed
+    by_day = {}
+    for day, amount, _, _ in rows:
+        income, expenses = by_day.get(day, (0, 0))
+        by_day[day] = (income + max(amount, 0), expenses + max(-amount, 0))
+    dates = sorted(by_day)
+    t = np.array([(day - dates[0]).days for day in dates], dtype='float64') / predictions.SCALE
+    targets = np.array([[income / 100, expenses / 100, (income - expenses) / 100] for income, expenses in (by_day[day] for day in dates)])
+    X = np.vander(t, predictions.DEGREE + 1, increasing=True)
+    coefficients = np.linalg.lstsq(X, targets, rcond=None)[0]
+    ahead = (np.arange(1, days + 1) + (dates[-1] - dates[0]).days) / predictions.SCALE
+    return np.vander(ahead, predictions.DEGREE + 1, increasing=True) @ coefficients, dates[-1]
+
+
+def check(expected):
+    # Everything the app reports against the same figures recomputed from the expected rows
+    rows = list(expected.rows.values())
+    totals = csv_file.totals()
+    for key, value in brute_totals(rows).items():
+        assert totals[key] == pytest.approx(value, abs=1e-9), key
+
+    ledger = csv_file.load(copy=False)
+    assert sorted(ledger.index.tolist()) == sorted(expected.rows)
+    assert {row_id: int(ledger.loc[row_id, 'Amount']) for row_id in expected.rows} == {row_id: row[1] for row_id, row in expected.rows.items()}
+
+    start, end = date(2024, 2, 1), date(2024, 3, 15)
+    matching = {row_id for row_id, (day, _, _, _) in expected.rows.items() if start <= day <= end}
+    assert set(csv_file.query(start=start, end=end).index) == matching
+    matching = {row_id for row_id, (_, amount, _, _) in expected.rows.items() if -5000 <= amount <= 5000}
+    assert set(csv_file.query(min_amount=-50, max_amount=50).index) == matching
+    matching = [row for row in rows if row[1] < 0 and start <= row[0] <= end]
+    for key, value in brute_totals(matching).items():
+        assert csv_file.totals(kind='expense', start=start, end=end)[key] == pytest.approx(value, abs=1e-9), key
+
+    months = {}
+    for day, amount, currency, _ in rows:
+        month = months.setdefault((pd.Timestamp(day.year, day.month, 1), currency), [0, 0])
+        month[0 if amount > 0 else 1] += abs(amount)
+    pivot = csv_file.monthly_by_currency()
+    for (month, currency), (income, expenses) in months.items():
+        assert pivot.loc[month, (currency, 'Income')] == pytest.approx(income / 100, abs=1e-9)
+        assert pivot.loc[month, (currency, 'Expenses')] == pytest.approx(expenses / 100, abs=1e-9)
+
+    forecast, scores = predictions.predict_future(14)
+    wanted, last = brute_forecast(rows, 14)
+    assert forecast['Dates'][0] == pd.Timestamp(last + timedelta(days=1))
+    for column, target in enumerate(predictions.TARGETS):
+        assert np.allclose(forecast[target], wanted[:, column], rtol=1e-6, atol=1e-6), target
+
+
+def edit_and_delete(expected, seed):
+    generator = random.Random(seed)
+    ids = sorted(expected.rows)
+    for row_id in generator.sample(ids, 5):
+        csv_file.delete_row(row_id)
+        expected.delete(row_id)
+        ids.remove(row_id)
+    for row_id in generator.sample(ids, 5):
+        day = date(2024, 1, 1) + timedelta(days=generator.randrange(150))
+        amount = generator.choice([-1, 1]) * generator.randrange(1, 100000) / 100
+        csv_file.edit_row(row_id, {'Date': day.strftime('%d-%m-%Y'), 'Amount': amount, 'Currency': 'USD'})
+        expected.edit(row_id, day=day, amount=amount, currency='USD')
+
+
+def test_fresh_ledger_drops_the_placeholder(ledger):
+    csv_file.get_csv(load=False)
+    expected = expected_ledger()
+    add(expected, random_rows(3, seed=1))
+    check(expected)
+
+
+def test_in_memory_changes(ledger):
+    expected = expected_ledger()
+    add(expected, random_rows(200, seed=2))
+    check(expected) # rollups, indexes and model are in memory from here on
+    add(expected, random_rows(20, seed=3))
+    check(expected)
+    edit_and_delete(expected, seed=4)
+    check(expected)
+
+
+def test_changes_across_restarts(ledger):
+    expected = expected_ledger()
+    add(expected, random_rows(200, seed=5))
+    check(expected)
+    restart()
+    check(expected) # from the sidecars
+
+    # One-off writes of separate processes only reach the logs, and the next process catches up from them
+    restart()
+    add(expected, random_rows(1, seed=6))
+    restart()
+    add(expected, random_rows(30, seed=7))
+    restart()
+    edit_and_delete(expected, seed=8)
+    restart()
+    built = []
+    build_model = predictions.build_model
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(predictions, 'build_model', classmethod(lambda cls: built.append(1) or build_model()))
+        check(expected)
+    assert not built, "the model was refitted instead of caught up"
+    restart()
+    check(expected)
+
+
+def test_compaction_keeps_ids_and_totals(ledger):
+    expected = expected_ledger()
+    add(expected, random_rows(200, seed=9))
+    check(expected)
+    edit_and_delete(expected, seed=10)
+    csv_file.compact()
+    assert not os.path.exists(csv_file.patch_file())
+    check(expected)
+    edit_and_delete(expected, seed=11)
+    add(expected, random_rows(10, seed=12)) # ids of deleted rows are never handed out again
+    check(expected)
+    restart()
+    csv_file.compact() # only the sidecars know the rollups now
+    restart()
+    check(expected)
+
+
+def test_compaction_interrupted_after_its_commit_point(ledger):
+    expected = expected_ledger()
+    add(expected, random_rows(200, seed=13))
+    check(expected)
+    edit_and_delete(expected, seed=14)
+    finish = csv_file.finish_compaction.__func__
+
+    def crash(cls):
+        if os.path.exists(cls.patch_file() + '.merged'):
+            raise RuntimeError("killed")
+        finish(cls)
+
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(csv_file, 'finish_compaction', classmethod(crash))
+        with pytest.raises(RuntimeError):
+            csv_file.compact()
+    assert os.path.exists(csv_file.patch_file() + '.merged')
+    restart(crashed=True)
+    check(expected)
+    assert not os.path.exists(csv_file.patch_file() + '.merged')
+
+
+def test_edited_placeholder_is_kept(ledger):
+    # Row 0 of a fresh ledger is the placeholder, once edited into a real transaction it must survive the next add
+    csv_file.get_csv(load=False)
+    csv_file.edit_row(0, {'Use': 'Salary', 'Comment': 'real', 'Amount': 2500})
+    restart()
+    expected = expected_ledger()
+    expected.add([{'Date': date(2025, 1, 1), 'Amount': 2500, 'Currency': 'PKR', 'Use': 'Salary'}])
+    add(expected, random_rows(5, seed=15))
+    check(expected)
+    restart()
+    check(expected)
+
+
+def test_rows_appended_by_hand_are_kept(ledger):
+    csv_file.get_csv(load=False)
+    csv_file.has_sentinel() # the flag is cached for this data.csv
+    with open(csv_file.CSV_FILE, 'a', newline='') as out:
+        csv.DictWriter(out, fieldnames=csv_file.Columns).writerow(make_row(date(2024, 1, 10), 75))
+    expected = expected_ledger()
+    expected.add([{'Date': date(2025, 1, 1), 'Amount': 1, 'Currency': 'PKR', 'Use': 'Error Handling'},
+                  {'Date': date(2024, 1, 10), 'Amount': 75, 'Currency': 'PKR', 'Use': 'Food'}])
+    add(expected, random_rows(5, seed=16))
+    check(expected)
+
+
+@pytest.mark.parametrize('amount', [12.345, -0.004, float('nan')])
+def test_amounts_finer_than_the_minor_unit_are_refused(ledger, amount):
+    expected = expected_ledger()
+    add(expected, random_rows(20, seed=17))
+    with open(csv_file.CSV_FILE) as before:
+        content = before.read()
+    with pytest.raises(ValueError):
+        csv_file.add_many([make_row(date(2024, 1, 5), amount)])
+    with pytest.raises(ValueError):
+        csv_file.edit_row(0, {'Amount': amount})
+    with open(csv_file.CSV_FILE) as after:
+        assert after.read() == content
+    check(expected)
+
+
+def test_missing_labels_match_a_rebuild(ledger):
+    expected = expected_ledger()
+    add(expected, random_rows(50, seed=18))
+    check(expected)
+    restart()
+    csv_file.add_many([make_row(date(2024, 2, 2), 10, currency=float('nan'), use=''),
+                       make_row(date(2024, 2, 3), -4, currency='', use=float('nan'))])
+    restart()
+    followed = csv_file.rollup('day')
+    restart(crashed=True)
+    for sidecar in (csv_file.rollup_file(), csv_file.rollup_log_file()):
+        os.remove(sidecar)
+    pd.testing.assert_frame_equal(followed, csv_file.rollup('day'))
+    assert math.isclose(csv_file.totals()['Income'], brute_totals(expected.rows.values())['Income'] + 10)